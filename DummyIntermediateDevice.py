@@ -26,7 +26,7 @@ if PY2:
 # easy to extend this is anyone needed further functionality.
 
 
-from labscript_devices import labscript_device, BLACS_tab, BLACS_worker
+from labscript_devices import labscript_device, BLACS_worker, deprecated_import_alias
 from labscript import IntermediateDevice, DigitalOut, AnalogOut, config
 import numpy as np
 
@@ -68,33 +68,10 @@ class DummyIntermediateDevice(IntermediateDevice):
         group.create_dataset('OUTPUTS', compression=config.compression, data=out_table)
 
 
-from blacs.device_base_class import DeviceTab
-from blacs.tab_base_classes import Worker
-
-@BLACS_tab
-class DummyIntermediateDeviceTab(DeviceTab):
-    def initialise_GUI(self):
-        self.create_worker("main_worker",DummyIntermediateDeviceWorker,{})
-        self.primary_worker = "main_worker"
-
-class DummyIntermediateDeviceWorker(Worker):
-    def init(self):
-        pass
-
-    def program_manual(self, front_panel_values):
-        return front_panel_values 
-
-    def transition_to_buffered(self, device_name, h5file, initial_values, fresh):
-        return initial_values
-
-    def transition_to_manual(self,abort = False):
-        return True
-
-    def abort_transition_to_buffered(self):
-        return self.transition_to_manual(True)
-        
-    def abort_buffered(self):
-        return self.transition_to_manual(True)
-
-    def shutdown(self):
-        pass
\ No newline at end of file
+# For backwards compatibility with code importing these from their old location:
+DummyIntermediateDeviceTab = deprecated_import_alias(
+    "labscript_devices.blacs_classes.DummyIntermediateDevice.DummyIntermediateDeviceTab"
+)
+DummyIntermediateDeviceWorker = deprecated_import_alias(
+    "labscript_devices.blacs_classes.DummyIntermediateDevice.DummyIntermediateDeviceWorker"
+)
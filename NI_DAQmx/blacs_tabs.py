@@ -177,6 +177,7 @@ class NI_DAQmxTab(DeviceTab):
                     'wait_timeout_connection': wait_timeout_connection,
                     'timeout_trigger_type': timeout_trigger_type,
                     'min_semiperiod_measurement': min_semiperiod_measurement,
+                    'low_latency': properties.get('low_latency_wait_monitor', False),
                 },
             )
             self.add_secondary_worker("wait_monitor_worker")
@@ -196,6 +197,7 @@ class NI_DAQmxTab(DeviceTab):
                     'AI_range': properties['AI_range'],
                     'AI_start_delay': properties['AI_start_delay'],
                     'clock_terminal': clock_terminal,
+                    'AI_publisher_port': properties.get('AI_publisher_port', None),
                 },
             )
             self.add_secondary_worker("acquisition_worker")
@@ -18,8 +18,18 @@ if PY2:
 
 import sys
 import time
+try:
+    from time import perf_counter
+except ImportError:
+    # Python 2:
+    from time import time as perf_counter
+import json
 import threading
 import logging
+if PY2:
+    from Queue import Queue, Empty, Full
+else:
+    from queue import Queue, Empty, Full
 
 from labscript_utils import check_version
 
@@ -34,8 +44,10 @@ import numpy as np
 from numpy.lib.recfunctions import structured_to_unstructured
 import labscript_utils.h5_lock
 import h5py
+import zmq
 from zprocess import Event
 from zprocess.utils import _reraise
+from labscript_utils.ls_zprocess import Context
 
 import labscript_utils.properties as properties
 from labscript_utils import dedent
@@ -43,17 +55,180 @@ from labscript_utils.connections import _ensure_str
 
 from blacs.tab_base_classes import Worker
 
-from .utils import split_conn_port, split_conn_DO, split_conn_AI
+from .utils import split_conn_port, split_conn_DO, split_conn_AI, structured_view
 from .daqmx_utils import incomplete_sample_detection
 
 
+class OutputTableStream(object):
+    """An output table in a shot file that is to be streamed to the device in chunks
+    while the shot runs, rather than written in full before it starts. The file is
+    opened only for as long as it takes to read each chunk, so that it is not kept
+    locked for the duration of the shot. Rows are returned as structured arrays even
+    if the table is saved as a 2D array."""
+
+    def __init__(self, h5file, dataset, chunk_size):
+        self.h5file = h5file
+        self.dataset_name = dataset.name
+        self.chunk_size = chunk_size
+        self.channels = dataset.attrs.get('channels', None)
+        self.length = len(dataset)
+        self.final_row = self._as_structured(dataset[-1:])[0]
+        self.dtype = self.final_row.dtype
+        self.all_zero = dataset.attrs['all_zero']
+        self.position = 0
+
+    def _as_structured(self, data):
+        if self.channels is None:
+            return data
+        return structured_view(data, self.channels)
+
+    def __len__(self):
+        return self.length
+
+    def read(self, n):
+        """Return the next n rows of the table, or fewer if it is exhausted"""
+        with h5py.File(self.h5file, 'r') as hdf5_file:
+            data = hdf5_file[self.dataset_name][self.position : self.position + n]
+        self.position += len(data)
+        return self._as_structured(data)
+
+
+class AIPublisher(object):
+    """Publishes analog input data on a ZMQ XPUB socket bound to the given port on
+    localhost. Subscribers choose to receive every nth sample by subscribing to the
+    topic b'AI/<n>/'. Each message is a multipart message of the topic, JSON metadata
+    with the channel names, the sample rate after decimation and the index of the
+    first sample since the task started, and the samples as a raw buffer of float32
+    with one column per channel. Data is only decimated and sent for the values of n
+    that have subscribers, and messages are dropped rather than queued once the high
+    water mark is reached, so that slow subscribers do not slow down acquisition.
+
+    Since ZMQ sockets must not be shared between threads, the socket is created, used
+    and closed only by a publisher thread. start() and close(), called by the worker,
+    and publish(), called by the DAQmx callback thread while the task runs, pass
+    commands and data to it through a queue."""
+
+    HWM = 100
+
+    def __init__(self, port):
+        self.port = port
+        self.queue = Queue(maxsize=self.HWM)
+        # Index since the task started of the next sample passed to publish():
+        self.n_samples = 0
+        # Set once the thread has bound the socket, or failed to, in which case the
+        # exception is re-raised here:
+        self.bound = threading.Event()
+        self.bind_error = None
+        self.thread = threading.Thread(target=self.mainloop)
+        self.thread.daemon = True
+        self.thread.start()
+        self.bound.wait()
+        if self.bind_error is not None:
+            self.thread.join()
+            raise self.bind_error
+
+    def start(self, chans, rate):
+        """Set the channels and rate of a newly started task"""
+        self.n_samples = 0
+        self.queue.put(('start', (chans, rate)))
+
+    def publish(self, data):
+        """Queue newly acquired data to be published, or drop it if the publisher
+        thread is too far behind"""
+        try:
+            self.queue.put_nowait(('data', (self.n_samples, data.copy())))
+        except Full:
+            pass
+        self.n_samples += len(data)
+
+    def close(self):
+        self.queue.put(('close', None))
+        self.thread.join()
+
+    def mainloop(self):
+        socket = Context().socket(zmq.XPUB)
+        try:
+            socket.setsockopt(zmq.SNDHWM, self.HWM)
+            try:
+                socket.bind('tcp://127.0.0.1:%d' % self.port)
+            except Exception as e:
+                self.bind_error = e
+                return
+            finally:
+                self.bound.set()
+            # Decimation factors with subscribers:
+            decimations = set()
+            chans = rate = None
+            while True:
+                try:
+                    command, args = self.queue.get(timeout=0.1)
+                except Empty:
+                    command = None
+                self.update_subscriptions(socket, decimations)
+                if command == 'close':
+                    return
+                elif command == 'start':
+                    chans, rate = args
+                elif command == 'data':
+                    self.send(socket, decimations, chans, rate, *args)
+        finally:
+            socket.close(linger=0)
+
+    @staticmethod
+    def update_subscriptions(socket, decimations):
+        """Process any subscription messages, which the XPUB socket gives us when
+        the first subscriber to a topic subscribes and when the last unsubscribes"""
+        while True:
+            try:
+                message = socket.recv(zmq.NOBLOCK)
+            except zmq.Again:
+                return
+            subscribe, topic = message[:1] == b'\x01', message[1:]
+            prefix, _, n = topic.rstrip(b'/').partition(b'/')
+            if prefix != b'AI' or not n.isdigit() or int(n) < 1:
+                continue
+            if subscribe:
+                decimations.add(int(n))
+            else:
+                decimations.discard(int(n))
+
+    @staticmethod
+    def send(socket, decimations, chans, rate, n_samples, data):
+        """Send data, whose first sample has index n_samples since the task started,
+        to the subscribers of each decimation"""
+        for n in decimations:
+            # Continue from where the previous data left off:
+            first = -n_samples % n
+            samples = np.ascontiguousarray(data[first::n], dtype=np.float32)
+            metadata = {'chans': chans, 'rate': rate / n, 'sample': n_samples + first}
+            try:
+                socket.send(b'AI/%d/' % n, zmq.SNDMORE | zmq.NOBLOCK)
+                socket.send_json(metadata, zmq.SNDMORE | zmq.NOBLOCK)
+                socket.send(samples, zmq.NOBLOCK, copy=False)
+            except zmq.Again:
+                pass
+
+
 class NI_DAQmxOutputWorker(Worker):
     def init(self):
+        # Prevent interference between the callbacks streaming output during a shot and
+        # the code stopping the output tasks:
+        self.tasklock = threading.RLock()
+        # Buffered output tasks from the previous shot, kept so that they can be
+        # restarted without reprogramming if the next shot has identical tables. Each
+        # is a tuple of (table, config, task), or None:
+        self.smart_cache = {'AO': None, 'DO': None}
+        # Pairs of arrays into which output tables saved as 2D arrays are read, reused
+        # from shot to shot:
+        self.table_buffers = {'AO': [None, None], 'DO': [None, None]}
         self.check_version()
         # Reset Device: clears previously added routes etc. Note: is insufficient for
         # some devices, which require power cycling to truly reset.
         DAQmxResetDevice(self.MAX_name)
         self.start_manual_mode_tasks()
+        # The calibration of each analog output, queried from the device the first time
+        # a shot's AO table is saved as integers:
+        self.AO_scaling_coeffs = {}
 
     def stop_tasks(self):
         if self.AO_task is not None:
@@ -67,6 +242,34 @@ class NI_DAQmxOutputWorker(Worker):
 
     def shutdown(self):
         self.stop_tasks()
+        self.clear_cached_tasks()
+
+    def get_cached_task(self, name, table, config, fresh):
+        """Return the buffered task for the outputs of the given type, 'AO' or 'DO',
+        that was programmed in a previous shot with an identical table and
+        configuration, or None if there is no such task or fresh is True. A cached task
+        that cannot be reused is cleared"""
+        cached = self.smart_cache[name]
+        if cached is None:
+            return None
+        cached_table, cached_config, task = cached
+        if (
+            not fresh
+            and not isinstance(table, OutputTableStream)
+            and cached_config == config
+            and cached_table.dtype == table.dtype
+            and np.array_equal(cached_table, table)
+        ):
+            return task
+        self.smart_cache[name] = None
+        task.ClearTask()
+        return None
+
+    def clear_cached_tasks(self):
+        for name, cached in self.smart_cache.items():
+            if cached is not None:
+                cached[2].ClearTask()
+                self.smart_cache[name] = None
 
     def check_version(self):
         """Check the version of PyDAQmx is high enough to avoid a known bug"""
@@ -116,6 +319,30 @@ class NI_DAQmxOutputWorker(Worker):
         if self.DO_task is not None:
             self.DO_task.StartTask()
 
+    def get_AO_scaling_coeffs(self, channels):
+        """Return a dictionary of the coefficients of the polynomial, in increasing
+        order of power, that converts volts to raw DAC codes for each analog output.
+        These are the device's calibration and do not change between shots, so we
+        query them from self.AO_task for any of the given channels not already known,
+        which is only needed for shots whose AO table is saved as integers."""
+        for chan in channels:
+            if chan in self.AO_scaling_coeffs:
+                continue
+            chan_coeffs = np.zeros(4, dtype=np.float64)
+            try:
+                self.AO_task.GetAODevScalingCoeff(
+                    self.MAX_name + '/' + chan, chan_coeffs, len(chan_coeffs)
+                )
+            except Exception as e:
+                msg = """Could not read the calibration of %s/%s from the device (%s),
+                    so the shot's analog output table, which was saved as integers,
+                    cannot be converted to DAC codes. The device may not support this.
+                    Set int16_AO=False for the device in the connection table to save
+                    the table in volts instead."""
+                raise RuntimeError(dedent(msg) % (self.MAX_name, chan, e))
+            self.AO_scaling_coeffs[chan] = chan_coeffs
+        return self.AO_scaling_coeffs
+
     def program_manual(self, front_panel_values):
         written = int32()
         if self.AO_task is not None:
@@ -147,19 +374,107 @@ class NI_DAQmxOutputWorker(Worker):
         # TODO: return coerced/quantised values
         return {}
 
+    def read_table_into_buffer(self, name, dataset, dtype):
+        """Read an output table saved as a 2D array into a reusable C-contiguous array
+        of the given dtype, which is the type written to DAQmx, and return a structured
+        view of it. One of two arrays is used, whichever does not hold the table of the
+        task in the smart cache, so that it can still be compared to the new one."""
+        buffers = self.table_buffers[name]
+        cached = self.smart_cache[name]
+        i = 0
+        if cached is not None and buffers[0] is not None:
+            if np.may_share_memory(buffers[0], cached[0]):
+                i = 1
+        shape = dataset.shape
+        buffer = buffers[i]
+        if (
+            buffer is None
+            or buffer.dtype != dtype
+            or buffer.shape[1:] != shape[1:]
+            or len(buffer) < shape[0]
+        ):
+            buffer = buffers[i] = np.empty(shape, dtype=dtype)
+        table = buffer[: shape[0]]
+        dataset.read_direct(table)
+        return structured_view(table, dataset.attrs['channels'])
+
     def get_output_tables(self, h5file, device_name):
-        """Return the AO and DO tables rom the file, or None if they do not exist."""
+        """Return the AO and DO tables rom the file, or None if they do not exist,
+        and the voltage of one unit of the AO table if it is saved as integers, or None
+        if it is saved in volts. If the shot was compiled with streaming_chunk_size set,
+        tables too long to fit in two chunks are returned as OutputTableStreams instead
+        of being read in full. Tables saved as 2D arrays are read into reusable arrays
+        of the types written to DAQmx."""
+        AO_volts_per_code = None
         with h5py.File(h5file, 'r') as hdf5_file:
             group = hdf5_file['devices'][device_name]
+            device_properties = properties.get(hdf5_file, device_name, 'device_properties')
+            chunk_size = device_properties.get('streaming_chunk_size', None)
+
+            def get_table(name, dtype):
+                dataset = group[name]
+                # Streaming is only worthwhile if, after the initial two chunks fill the
+                # task's buffer, there is something left to stream. One more sample
+                # than is output is saved, hence the + 1:
+                if chunk_size is not None and len(dataset) > 2 * chunk_size + 1:
+                    return OutputTableStream(h5file, dataset, chunk_size)
+                if 'channels' in dataset.attrs:
+                    return self.read_table_into_buffer(name, dataset, dtype)
+                return dataset[:]
+
             try:
-                AO_table = group['AO'][:]
+                AO_volts_per_code = group['AO'].attrs.get('volts_per_code', None)
+                AO_dtype = np.float64 if AO_volts_per_code is None else np.int16
+                AO_table = get_table('AO', AO_dtype)
             except KeyError:
                 AO_table = None
             try:
-                DO_table = group['DO'][:]
+                # See the comment in self.program_manual as to why we are using uint32
+                # instead of the native size of each port:
+                DO_table = get_table('DO', np.uint32)
             except KeyError:
                 DO_table = None
-        return AO_table, DO_table
+        return AO_table, DO_table, AO_volts_per_code
+
+    def start_output_stream(self, task, stream, npts, convert, write):
+        """Write the first two chunks of the first npts samples of an
+        OutputTableStream to a task that is yet to be started, and register a callback
+        to write each subsequent chunk as the previous one is transferred out of the
+        task's buffer. convert is a function converting rows of the table to the
+        array to be written, and write the task's method for writing it."""
+        chunk_size = stream.chunk_size
+        written = int32()
+
+        # Without regeneration, DAQmx waits for us to write new samples rather than
+        # outputting old ones again, and errors if we don't keep up:
+        task.SetWriteRegenMode(DAQmx_Val_DoNotAllowRegen)
+        task.CfgOutputBuffer(2 * chunk_size)
+
+        def write_chunk():
+            n = min(chunk_size, npts - stream.position)
+            if n > 0:
+                data = convert(stream.read(n))
+                write(n, False, 10.0, DAQmx_Val_GroupByScanNumber, data, written, None)
+
+        def callback(task_handle, event_type, num_samples, callback_data=None):
+            with self.tasklock:
+                if task is not self.AO_task and task is not self.DO_task:
+                    # Task stopped already.
+                    return 0
+                try:
+                    write_chunk()
+                except Exception:
+                    self.logger.exception('Error streaming output')
+            return 0
+
+        write_chunk()
+        write_chunk()
+
+        # This must not be garbage collected until the task is:
+        task.callback_ptr = DAQmxEveryNSamplesEventCallbackPtr(callback)
+        task.RegisterEveryNSamplesEvent(
+            DAQmx_Val_Transferred_From_Buffer, chunk_size, 0, task.callback_ptr, None
+        )
 
     def set_mirror_clock_terminal_connected(self, connected):
         """Mirror the clock terminal on another terminal to allow daisy chaining of the
@@ -175,39 +490,58 @@ class NI_DAQmxOutputWorker(Worker):
         else:
             DAQmxDisconnectTerms(self.clock_terminal, self.clock_mirror_terminal)
 
-    def program_buffered_DO(self, DO_table):
-        """Create the DO task and program in the DO table for a shot. Return a
-        dictionary of the final values of each channel in use"""
+    def program_buffered_DO(self, DO_table, fresh=True):
+        """Create the DO task and program in the DO table for a shot, which may be an
+        OutputTableStream. Unless fresh is True, the task from the previous shot is
+        restarted instead if the table is unchanged. Return a dictionary of the final
+        values of each channel in use"""
         if DO_table is None:
             return {}
-        self.DO_task = Task()
         written = int32()
         ports = DO_table.dtype.names
+        streaming = isinstance(DO_table, OutputTableStream)
+        final_row = DO_table.final_row if streaming else DO_table[-1]
 
+        # Collect the final values of the lines on each port:
         final_values = {}
         for port_str in ports:
-            # Add each port to the task:
-            con = '%s/%s' % (self.MAX_name, port_str)
-            self.DO_task.CreateDOChan(con, "", DAQmx_Val_ChanForAllLines)
-
-            # Collect the final values of the lines on this port:
-            port_final_value = DO_table[port_str][-1]
+            port_final_value = final_row[port_str]
             for line in range(self.ports[port_str]["num_lines"]):
                 # Extract each digital value from the packed bits:
                 line_final_value = bool((1 << line) & port_final_value)
                 final_values['%s/line%d' % (port_str, line)] = int(line_final_value)
 
-        # Convert DO table to a regular array and ensure it is C continguous:
-        DO_table = np.ascontiguousarray(
-            structured_to_unstructured(DO_table, dtype=np.uint32)
-        )
+        cached_task = self.get_cached_task('DO', DO_table, None, fresh)
+        if cached_task is not None:
+            # Same table as last shot. The task still holds its data and timing
+            # configuration, and restarting it regenerates the buffer from the start:
+            self.DO_task = cached_task
+            self.DO_all_zero = False
+            self.DO_task.StartTask()
+            return final_values
+
+        self.DO_task = Task()
+        for port_str in ports:
+            # Add each port to the task:
+            con = '%s/%s' % (self.MAX_name, port_str)
+            self.DO_task.CreateDOChan(con, "", DAQmx_Val_ChanForAllLines)
+
+        def convert(table):
+            # Convert DO table to a regular array and ensure it is C continguous:
+            return np.ascontiguousarray(structured_to_unstructured(table, dtype=np.uint32))
 
         # Check if DOs are all zero for the whole shot. If they are this triggers a
         # bug in NI-DAQmx that throws a cryptic error for buffered output. In this
         # case, run it as a non-buffered task.
-        self.DO_all_zero = not np.any(DO_table)
-        if self.DO_all_zero:
-            DO_table = DO_table[0:1]
+        if streaming:
+            self.DO_all_zero = DO_table.all_zero
+            if self.DO_all_zero:
+                DO_table = DO_table.read(1)
+                streaming = False
+        else:
+            self.DO_all_zero = not any(np.any(DO_table[p]) for p in ports)
+            if self.DO_all_zero:
+                DO_table = DO_table[0:1]
 
         if self.static_DO or self.DO_all_zero:
             # Static DO. Start the task and write data, no timing configuration.
@@ -219,7 +553,7 @@ class NI_DAQmxOutputWorker(Worker):
                 False,  # autostart
                 10.0,  # timeout
                 DAQmx_Val_GroupByScanNumber,
-                DO_table,
+                convert(DO_table),
                 written,
                 None,
             )
@@ -241,52 +575,107 @@ class NI_DAQmxOutputWorker(Worker):
 
             # Write data. See the comment in self.program_manual as to why we are using
             # uint32 instead of the native size of each port.
-            self.DO_task.WriteDigitalU32(
-                npts,
-                False,  # autostart
-                10.0,  # timeout
-                DAQmx_Val_GroupByScanNumber,
-                DO_table[:-1], # All but the last sample as mentioned above
-                written,
-                None,
-            )
+            if streaming:
+                self.start_output_stream(
+                    self.DO_task, DO_table, npts, convert, self.DO_task.WriteDigitalU32
+                )
+            else:
+                self.DO_task.WriteDigitalU32(
+                    npts,
+                    False,  # autostart
+                    10.0,  # timeout
+                    DAQmx_Val_GroupByScanNumber,
+                    convert(DO_table[:-1]), # All but the last sample as mentioned above
+                    written,
+                    None,
+                )
+                self.smart_cache['DO'] = (DO_table, None, self.DO_task)
 
             # Go!
             self.DO_task.StartTask()
 
         return final_values
 
-    def program_buffered_AO(self, AO_table):
+    def AO_table_to_raw(self, AO_table, volts_per_code):
+        """Convert an AO table saved as integers to a C contiguous array of the raw
+        DAC codes for each channel, using the device's calibration. The integers are
+        voltages in units of volts_per_code rather than DAC codes, so this conversion
+        is needed for every shot not already in the smart cache"""
+        raw = np.empty((len(AO_table), len(AO_table.dtype.names)), dtype=np.int16)
+        int16_info = np.iinfo(np.int16)
+        for i, chan in enumerate(AO_table.dtype.names):
+            # The calibration polynomial in terms of the integers in the table rather
+            # than volts:
+            coeffs = self.AO_scaling_coeffs[chan]
+            coeffs = coeffs * volts_per_code ** np.arange(len(coeffs))
+            codes = np.polynomial.polynomial.polyval(AO_table[chan], coeffs)
+            raw[:, i] = np.clip(np.rint(codes), int16_info.min, int16_info.max)
+        return raw
+
+    def program_buffered_AO(self, AO_table, volts_per_code=None, fresh=True):
+        """Create the AO task and program in the AO table for a shot, which may be an
+        OutputTableStream. If volts_per_code is not None, the table is saved as
+        integers, which are converted to raw DAC codes and written without further
+        scaling by DAQmx. Unless fresh is True, the task from the previous shot is
+        restarted instead if the table and volts_per_code are unchanged. Return a
+        dictionary of the final values of each channel in use"""
         if AO_table is None:
             return {}
-        self.AO_task = Task()
         written = int32()
-        channels = ', '.join(self.MAX_name + '/' + c for c in AO_table.dtype.names)
-        self.AO_task.CreateAOVoltageChan(
-            channels, "", self.Vmin, self.Vmax, DAQmx_Val_Volts, None
-        )
+        streaming = isinstance(AO_table, OutputTableStream)
+        final_row = AO_table.final_row if streaming else AO_table[-1]
 
         # Collect the final values of the analog outs:
-        final_values = dict(zip(AO_table.dtype.names, AO_table[-1]))
+        final_values = dict(zip(AO_table.dtype.names, final_row))
+        if volts_per_code is not None:
+            final_values = {c: v * volts_per_code for c, v in final_values.items()}
+
+        cached_task = self.get_cached_task('AO', AO_table, volts_per_code, fresh)
+        if cached_task is not None:
+            # Same table as last shot. The task still holds its data and timing
+            # configuration, and restarting it regenerates the buffer from the start:
+            self.AO_task = cached_task
+            self.AO_all_zero = False
+            self.AO_task.StartTask()
+            return final_values
 
-        # Convert AO table to a regular array and ensure it is C continguous:
-        AO_table = np.ascontiguousarray(
-            structured_to_unstructured(AO_table, dtype=np.float64)
+        self.AO_task = Task()
+        channels = ', '.join(self.MAX_name + '/' + c for c in AO_table.dtype.names)
+        self.AO_task.CreateAOVoltageChan(
+            channels, "", self.Vmin, self.Vmax, DAQmx_Val_Volts, None
         )
 
         # Check if AOs are all zero for the whole shot. If they are this triggers a
         # bug in NI-DAQmx that throws a cryptic error for buffered output. In this
         # case, run it as a non-buffered task.
-        self.AO_all_zero = not np.any(AO_table)
-        if self.AO_all_zero:
-            AO_table = AO_table[0:1]
+        if streaming:
+            self.AO_all_zero = AO_table.all_zero
+            if self.AO_all_zero:
+                AO_table = AO_table.read(1)
+                streaming = False
+        else:
+            self.AO_all_zero = not any(np.any(AO_table[c]) for c in AO_table.dtype.names)
+            if self.AO_all_zero:
+                AO_table = AO_table[0:1]
+
+        if volts_per_code is not None:
+            self.get_AO_scaling_coeffs(AO_table.dtype.names)
+
+            def convert(table):
+                return self.AO_table_to_raw(table, volts_per_code)
+            write = self.AO_task.WriteBinaryI16
+        else:
+            def convert(table):
+                # Convert AO table to a regular array and ensure it is C continguous:
+                return np.ascontiguousarray(
+                    structured_to_unstructured(table, dtype=np.float64)
+                )
+            write = self.AO_task.WriteAnalogF64
 
         if self.static_AO or self.AO_all_zero:
             # Static AO. Start the task and write data, no timing configuration.
             self.AO_task.StartTask()
-            self.AO_task.WriteAnalogF64(
-                1, True, 10.0, DAQmx_Val_GroupByChannel, AO_table, written, None
-            )
+            write(1, True, 10.0, DAQmx_Val_GroupByChannel, convert(AO_table), written, None)
         else:
             # We use all but the last sample (which is identical to the second last
             # sample) in order to ensure there is one more clock tick than there are
@@ -304,15 +693,19 @@ class NI_DAQmxOutputWorker(Worker):
             )
 
             # Write data:
-            self.AO_task.WriteAnalogF64(
-                npts,
-                False,  # autostart
-                10.0,  # timeout
-                DAQmx_Val_GroupByScanNumber,
-                AO_table[:-1],  # All but the last sample as mentioned above
-                written,
-                None,
-            )
+            if streaming:
+                self.start_output_stream(self.AO_task, AO_table, npts, convert, write)
+            else:
+                write(
+                    npts,
+                    False,  # autostart
+                    10.0,  # timeout
+                    DAQmx_Val_GroupByScanNumber,
+                    convert(AO_table[:-1]),  # All but the last sample as mentioned above
+                    written,
+                    None,
+                )
+                self.smart_cache['AO'] = (AO_table, volts_per_code, self.AO_task)
 
             # Go!
             self.AO_task.StartTask()
@@ -327,14 +720,16 @@ class NI_DAQmxOutputWorker(Worker):
         self.stop_tasks()
 
         # Get the data to be programmed into the output tasks:
-        AO_table, DO_table = self.get_output_tables(h5file, device_name)
+        AO_table, DO_table, AO_volts_per_code = self.get_output_tables(
+            h5file, device_name
+        )
 
         # Mirror the clock terminal, if applicable:
         self.set_mirror_clock_terminal_connected(True)
 
         # Program the output tasks and retrieve the final values of each output:
-        DO_final_values = self.program_buffered_DO(DO_table)
-        AO_final_values = self.program_buffered_AO(AO_table)
+        DO_final_values = self.program_buffered_DO(DO_table, fresh)
+        AO_final_values = self.program_buffered_AO(AO_table, AO_volts_per_code, fresh)
 
         final_values = {}
         final_values.update(DO_final_values)
@@ -354,12 +749,15 @@ class NI_DAQmxOutputWorker(Worker):
         npts = uInt64()
         samples = uInt64()
         tasks = []
-        if self.AO_task is not None:
-            tasks.append([self.AO_task, self.static_AO or self.AO_all_zero, 'AO'])
-            self.AO_task = None
-        if self.DO_task is not None:
-            tasks.append([self.DO_task, self.static_DO or self.DO_all_zero, 'DO'])
-            self.DO_task = None
+        # Once the tasks are no longer our instance variables, any output streaming
+        # callbacks will do nothing:
+        with self.tasklock:
+            if self.AO_task is not None:
+                tasks.append([self.AO_task, self.static_AO or self.AO_all_zero, 'AO'])
+                self.AO_task = None
+            if self.DO_task is not None:
+                tasks.append([self.DO_task, self.static_DO or self.DO_all_zero, 'DO'])
+                self.DO_task = None
 
         for task, static, name in tasks:
             if not abort:
@@ -379,6 +777,14 @@ class NI_DAQmxOutputWorker(Worker):
                         msg = 'Stopping %s at sample %d of %d'
                         self.logger.info(msg, name, current, total)
                 task.StopTask()
+            cached = self.smart_cache[name]
+            if cached is not None and cached[2] is task:
+                if not abort:
+                    # Keep the stopped task for reuse if the next shot is the same. Not
+                    # having been explicitly committed, it releases its resources for
+                    # the manual mode tasks when stopped:
+                    continue
+                self.smart_cache[name] = None
             task.ClearTask()
 
         # Remove the mirroring of the clock terminal, if applicable:
@@ -400,8 +806,10 @@ class NI_DAQmxOutputWorker(Worker):
 
 
 class NI_DAQmxAcquisitionWorker(Worker):
+    # Read data every MAX_READ_INTERVAL seconds, or more often if that many samples
+    # of all channels would be more than MAX_READ_BYTES:
     MAX_READ_INTERVAL = 0.2
-    MAX_READ_PTS = 10000
+    MAX_READ_BYTES = 8 * 1024 ** 2
 
     def init(self):
         # Prevent interference between the read callback and the shutdown code:
@@ -415,14 +823,31 @@ class NI_DAQmxAcquisitionWorker(Worker):
         self.buffered_mode = False
         self.h5_file = None
         self.acquired_data = None
+        self.n_acquired = 0
+        self.grow_acquired_data = False
         self.buffered_rate = None
         self.buffered_chans = None
+        # Set if only acquiring in the windows of time requested by acquisitions:
+        self.AI_trigger_terminal = None
+        self.samples_per_window = None
+        # Whether to save acquired traces without their times:
+        self.implicit_AI_times = False
+        # Whether to acquire raw ADC codes rather than volts, and the coefficients of
+        # the polynomials converting them to volts for each channel:
+        self.int16_AI = False
+        self.AI_scaling_coeffs = None
 
         # Hard coded for now. Perhaps we will add functionality to enable
         # and disable inputs in manual mode, and adjust the rate:
         self.manual_mode_chans = ['ai%d' % i for i in range(self.num_AI)]
         self.manual_mode_rate = 1000
 
+        # For publishing manual mode data, if configured:
+        if self.AI_publisher_port is not None:
+            self.AI_publisher = AIPublisher(self.AI_publisher_port)
+        else:
+            self.AI_publisher = None
+
         # An event for knowing when the wait durations are known, so that we may use
         # them to chunk up acquisition data:
         self.wait_durations_analysed = Event('wait_durations_analysed')
@@ -433,6 +858,8 @@ class NI_DAQmxAcquisitionWorker(Worker):
     def shutdown(self):
         if self.task is not None:
             self.stop_task()
+        if self.AI_publisher is not None:
+            self.AI_publisher.close()
 
     def read(self, task_handle, event_type, num_samples, callback_data=None):
         """Called as a callback by DAQmx while task is running. Also called by us to get
@@ -443,7 +870,11 @@ class NI_DAQmxAcquisitionWorker(Worker):
             if self.task is None or task_handle != self.task.taskHandle.value:
                 # Task stopped already.
                 return 0
-            self.task.ReadAnalogF64(
+            if self.read_array.dtype == np.int16:
+                read = self.task.ReadBinaryI16
+            else:
+                read = self.task.ReadAnalogF64
+            read(
                 num_samples,
                 -1,
                 DAQmx_Val_GroupByScanNumber,
@@ -452,23 +883,49 @@ class NI_DAQmxAcquisitionWorker(Worker):
                 samples_read,
                 None,
             )
-            # Select only the data read, and downconvert to 32 bit:
-            data = self.read_array[: int(samples_read.value), :].astype(np.float32)
+            # Select only the data read:
+            data = self.read_array[: int(samples_read.value), :]
             if self.buffered_mode:
-                # Append to the list of acquired data:
-                self.acquired_data.append(data)
-            else:
-                # TODO: Send it to the broker thingy.
-                pass
+                self.store_acquired_data(data)
+            elif self.AI_publisher is not None:
+                self.AI_publisher.publish(data)
         return 0
 
+    def store_acquired_data(self, data):
+        """Copy newly read data into the next rows of self.acquired_data, downconverting
+        it to 32 bit unless it is raw int16 data. This array is preallocated with enough rows for the shot's
+        acquisitions. Any further data is discarded, unless there are waits during
+        continuous acquisition, in which case the number of rows needed is not known in
+        advance and the array is grown as required."""
+        start = self.n_acquired
+        end = start + len(data)
+        if end > len(self.acquired_data):
+            if self.grow_acquired_data:
+                size = max(end, 2 * len(self.acquired_data))
+                acquired_data = np.empty(
+                    (size, data.shape[1]), dtype=self.acquired_data.dtype
+                )
+                acquired_data[:start] = self.acquired_data[:start]
+                self.acquired_data = acquired_data
+            else:
+                end = len(self.acquired_data)
+                data = data[: end - start]
+        self.acquired_data[start:end] = data
+        self.n_acquired = end
+
+    def read_chunk_size(self, rate, n_chans):
+        """The number of samples per channel to read at a time, given the acquisition
+        rate and number of channels"""
+        max_samples = self.MAX_READ_BYTES // (n_chans * np.dtype(np.float64).itemsize)
+        return max(1, min(max_samples, int(rate * self.MAX_READ_INTERVAL)))
+
     def start_task(self, chans, rate):
-        """Set up a task that acquires data with a callback every MAX_READ_PTS points or
-        MAX_READ_INTERVAL seconds, whichever is faster. NI DAQmx calls callbacks in a
-        separate thread, so this method returns, but data acquisition continues until
-        stop_task() is called. Data is appended to self.acquired_data if
-        self.buffered_mode=True, or (TODO) sent to the [whatever the AI server broker is
-        called] if self.buffered_mode=False."""
+        """Set up a task that acquires data with a callback every MAX_READ_INTERVAL
+        seconds, or more often if needed to read at most MAX_READ_BYTES at a time. NI
+        DAQmx calls callbacks in a separate thread, so this method returns, but data
+        acquisition continues until stop_task() is called. Data is stored in
+        self.acquired_data if self.buffered_mode=True, or published by
+        self.AI_publisher, if any, if self.buffered_mode=False."""
 
         if self.task is not None:
             raise RuntimeError('Task already running')
@@ -476,11 +933,13 @@ class NI_DAQmxAcquisitionWorker(Worker):
         if chans is None:
             return
 
-        # Get data MAX_READ_PTS points at a time or once every MAX_READ_INTERVAL
-        # seconds, whichever is faster:
-        num_samples = min(self.MAX_READ_PTS, int(rate * self.MAX_READ_INTERVAL))
+        num_samples = self.read_chunk_size(rate, len(chans))
 
-        self.read_array = np.zeros((num_samples, len(chans)), dtype=np.float64)
+        if self.buffered_mode and self.int16_AI:
+            dtype = np.int16
+        else:
+            dtype = np.float64
+        self.read_array = np.zeros((num_samples, len(chans)), dtype=dtype)
         self.task = Task()
 
         for chan in chans:
@@ -493,12 +952,25 @@ class NI_DAQmxAcquisitionWorker(Worker):
                 DAQmx_Val_Volts,
                 None,
             )
+        if dtype == np.int16:
+            self.AI_scaling_coeffs = self.get_AI_scaling_coeffs(chans)
 
-        self.task.CfgSampClkTiming(
-            "", rate, DAQmx_Val_Rising, DAQmx_Val_ContSamps, num_samples
-        )
-        if self.buffered_mode:
-            self.task.CfgDigEdgeStartTrig(self.clock_terminal, DAQmx_Val_Rising)
+        if self.buffered_mode and self.samples_per_window is not None:
+            # Acquire a window of samples every time we are triggered:
+            self.task.CfgSampClkTiming(
+                "", rate, DAQmx_Val_Rising, DAQmx_Val_FiniteSamps, self.samples_per_window
+            )
+            self.task.CfgInputBuffer(max(4 * num_samples, self.samples_per_window))
+            self.task.CfgDigEdgeStartTrig(self.AI_trigger_terminal, DAQmx_Val_Rising)
+            self.task.SetStartTrigRetriggerable(True)
+        else:
+            # Ask for an input buffer of several reads' worth of samples, so that a late
+            # callback does not overflow it now that reads can be large:
+            self.task.CfgSampClkTiming(
+                "", rate, DAQmx_Val_Rising, DAQmx_Val_ContSamps, 4 * num_samples
+            )
+            if self.buffered_mode:
+                self.task.CfgDigEdgeStartTrig(self.clock_terminal, DAQmx_Val_Rising)
 
         # This must not be garbage collected until the task is:
         self.task.callback_ptr = DAQmxEveryNSamplesEventCallbackPtr(self.read)
@@ -507,14 +979,40 @@ class NI_DAQmxAcquisitionWorker(Worker):
             DAQmx_Val_Acquired_Into_Buffer, num_samples, 0, self.task.callback_ptr, 100
         )
 
+        if not self.buffered_mode and self.AI_publisher is not None:
+            self.AI_publisher.start(chans, rate)
         self.task.StartTask()
 
+    def get_AI_scaling_coeffs(self, chans):
+        """Return a dictionary of the coefficients of the polynomial, in increasing
+        order of power, that converts raw ADC codes to volts for each of the given
+        channels of the current task"""
+        coeffs = {}
+        for chan in chans:
+            chan_coeffs = np.zeros(4, dtype=np.float64)
+            self.task.GetAIDevScalingCoeff(
+                self.MAX_name + '/' + chan, chan_coeffs, len(chan_coeffs)
+            )
+            coeffs[chan] = chan_coeffs
+        return coeffs
+
     def stop_task(self):
         with self.tasklock:
             if self.task is None:
                 raise RuntimeError('Task not running')
             # Read remaining data:
-            self.read(self.task, None, -1)
+            if self.buffered_mode and self.samples_per_window is not None:
+                # A finite task would wait for all its samples if asked to read all of
+                # them, so read only those available:
+                available = uInt32()
+                self.task.GetReadAvailSampPerChan(available)
+                remaining = available.value
+                while remaining:
+                    num_samples = min(remaining, len(self.read_array))
+                    self.read(self.task.taskHandle.value, None, num_samples)
+                    remaining -= num_samples
+            else:
+                self.read(self.task, None, -1)
             # Stop the task:
             self.task.StopTask()
             self.task.ClearTask()
@@ -532,6 +1030,8 @@ class NI_DAQmxAcquisitionWorker(Worker):
                 return {}
             AI_table = group['AI'][:]
             device_properties = properties.get(f, device_name, 'device_properties')
+            waits_in_use = len(f['waits']) > 0
+            self.samples_per_window = group['AI'].attrs.get('samples_per_window', None)
 
         chans = [_ensure_str(c) for c in AI_table['connection']]
         # Remove duplicates and sort:
@@ -539,7 +1039,24 @@ class NI_DAQmxAcquisitionWorker(Worker):
             self.buffered_chans = sorted(set(chans), key=split_conn_AI)
         self.h5_file = h5file
         self.buffered_rate = device_properties['acquisition_rate']
-        self.acquired_data = []
+        self.AI_trigger_terminal = device_properties.get('AI_trigger_terminal', None)
+        self.implicit_AI_times = device_properties.get('implicit_AI_times', False)
+        self.int16_AI = device_properties.get('int16_AI', False)
+        if self.samples_per_window is not None:
+            # Exactly one window of samples per distinct acquisition start time:
+            n_windows = len(np.unique(AI_table['start']))
+            n_rows = n_windows * self.samples_per_window
+            self.grow_acquired_data = False
+        else:
+            # Preallocate the rows needed to reach the end of the last acquisition, not
+            # counting waits. Samples are acquired from AI_start_delay:
+            t_end = max(AI_table['stop'].max(initial=0) - self.AI_start_delay, 0)
+            n_rows = int(np.ceil(self.buffered_rate * t_end)) + 2
+            self.grow_acquired_data = waits_in_use
+        n_chans = len(self.buffered_chans) if chans else 0
+        dtype = np.int16 if self.int16_AI else np.float32
+        self.acquired_data = np.empty((n_rows, n_chans), dtype=dtype)
+        self.n_acquired = 0
         # Stop the manual mode task and start the buffered mode task:
         self.stop_task()
         self.buffered_mode = True
@@ -562,9 +1079,12 @@ class NI_DAQmxAcquisitionWorker(Worker):
 
         if abort:
             self.acquired_data = None
+            self.n_acquired = 0
             self.buffered_chans = None
             self.h5_file = None
             self.buffered_rate = None
+            self.AI_trigger_terminal = None
+            self.samples_per_window = None
             return True
 
         with h5py.File(self.h5_file, 'a') as hdf5_file:
@@ -572,22 +1092,32 @@ class NI_DAQmxAcquisitionWorker(Worker):
             data_group.create_group(self.device_name)
             waits_in_use = len(hdf5_file['waits']) > 0
 
-        if self.buffered_chans is not None and not self.acquired_data:
+        if self.buffered_chans is not None and not self.n_acquired:
             msg = """No data was acquired. Perhaps the acquisition task was not
                 triggered to start, is the device connected to a pseudoclock?"""
             raise RuntimeError(dedent(msg))
-        # Concatenate our chunks of acquired data and recast them as a structured
-        # array with channel names:
-        if self.acquired_data:
+        if self.samples_per_window is not None and self.n_acquired < len(
+            self.acquired_data
+        ):
+            msg = """Only %d of %d samples were acquired. Perhaps some acquisition
+                windows were not triggered, is %s connected to an output pulsed at the
+                start time of every acquisition?"""
+            msg = msg % (self.n_acquired, len(self.acquired_data), self.AI_trigger_terminal)
+            raise RuntimeError(dedent(msg))
+        # Recast the acquired data as a structured array with channel names:
+        if self.n_acquired:
             start_time = time.time()
-            dtypes = [(chan, np.float32) for chan in self.buffered_chans]
-            raw_data = np.concatenate(self.acquired_data).view(dtypes)
+            dtypes = [(chan, self.acquired_data.dtype) for chan in self.buffered_chans]
+            raw_data = self.acquired_data[: self.n_acquired].view(dtypes)
             raw_data = raw_data.reshape((len(raw_data),))
             self.acquired_data = None
+            self.n_acquired = 0
             self.buffered_chans = None
             self.extract_measurements(raw_data, waits_in_use)
             self.h5_file = None
             self.buffered_rate = None
+            self.AI_trigger_terminal = None
+            self.samples_per_window = None
             msg = 'data written, time taken: %ss' % str(time.time() - start_time)
         else:
             msg = 'No acquisitions in this shot.'
@@ -603,51 +1133,71 @@ class NI_DAQmxAcquisitionWorker(Worker):
             self.wait_durations_analysed.wait(self.h5_file)
 
         with h5py.File(self.h5_file, 'a') as hdf5_file:
-            if waits_in_use:
-                # get the wait start times and durations
-                waits = hdf5_file['/data/waits']
-                wait_times = waits['time']
-                wait_durations = waits['duration']
             try:
-                acquisitions = hdf5_file['/devices/' + self.device_name + '/AI']
+                acquisitions = hdf5_file['/devices/' + self.device_name + '/AI'][:]
             except KeyError:
                 # No acquisitions!
                 return
+            if waits_in_use:
+                waits = np.sort(hdf5_file['/data/waits'][:], order='time')
             try:
                 measurements = hdf5_file['/data/traces']
             except KeyError:
                 # Group doesn't exist yet, create it:
                 measurements = hdf5_file.create_group('/data/traces')
 
-            t0 = self.AI_start_delay
-            for connection, label, t_start, t_end, _, _, _ in acquisitions:
+            rate = self.buffered_rate
+            t_start = acquisitions['start']
+            t_end = acquisitions['stop']
+            # The index in raw_data of the first sample that could be in each
+            # acquisition:
+            if self.samples_per_window is None:
+                first = np.zeros(len(acquisitions), dtype=int)
+            else:
+                window_starts = np.unique(t_start)
+                first = np.searchsorted(window_starts, t_start) * self.samples_per_window
+            if waits_in_use:
+                # Add the durations of all waits that start prior to the start and end
+                # of each acquisition, the latter to allow for waits during an
+                # acquisition:
+                wait_offsets = np.concatenate([[0], np.cumsum(waits['duration'])])
+                t_start = t_start + wait_offsets[np.searchsorted(waits['time'], t_start)]
+                t_end = t_end + wait_offsets[np.searchsorted(waits['time'], t_end)]
+            # The time of the first sample that could be in each acquisition. Windows
+            # start sampling at the start of their acquisitions, which have no waits
+            # during them:
+            t_first = self.AI_start_delay
+            if self.samples_per_window is not None:
+                t_first = t_start + t_first
+            i_start = np.ceil(rate * (t_start - t_first)).astype(int)
+            i_end = np.floor(rate * (t_end - t_first)).astype(int)
+            # np.ceil does what we want above, but float errors can miss the equality:
+            i_start[t_first + (i_start - 1) / rate - t_start > -2e-16] -= 1
+            # We want np.floor(x) to yield the largest integer < x (not <=):
+            i_end[t_end - t_first - i_end / rate < 2e-16] -= 1
+            t_i = t_first + i_start / rate
+
+            for i, (connection, label) in enumerate(
+                zip(acquisitions['connection'], acquisitions['label'])
+            ):
                 connection = _ensure_str(connection)
-                label = _ensure_str(label)
-                if waits_in_use:
-                    # add durations from all waits that start prior to t_start of
-                    # acquisition
-                    t_start += wait_durations[(wait_times < t_start)].sum()
-                    # compare wait times to t_end to allow for waits during an
-                    # acquisition
-                    t_end += wait_durations[(wait_times < t_end)].sum()
-                i_start = int(np.ceil(self.buffered_rate * (t_start - t0)))
-                i_end = int(np.floor(self.buffered_rate * (t_end - t0)))
-                # np.ceil does what we want above, but float errors can miss the
-                # equality:
-                if t0 + (i_start - 1) / self.buffered_rate - t_start > -2e-16:
-                    i_start -= 1
-                # We want np.floor(x) to yield the largest integer < x (not <=):
-                if t_end - t0 - i_end / self.buffered_rate < 2e-16:
-                    i_end -= 1
-                t_i = t0 + i_start / self.buffered_rate
-                t_f = t0 + i_end / self.buffered_rate
-                times = np.linspace(t_i, t_f, i_end - i_start + 1, endpoint=True)
-                values = raw_data[connection][i_start : i_end + 1]
-                dtypes = [('t', np.float64), ('values', np.float32)]
-                data = np.empty(len(values), dtype=dtypes)
-                data['t'] = times
-                data['values'] = values
-                measurements.create_dataset(label, data=data)
+                n = i_end[i] - i_start[i] + 1
+                values = raw_data[connection][
+                    first[i] + i_start[i] : first[i] + i_start[i] + n
+                ]
+                if self.implicit_AI_times:
+                    # Save only the values, with the times of samples implied:
+                    dataset = measurements.create_dataset(_ensure_str(label), data=values)
+                    dataset.attrs['t0'] = t_i[i]
+                    dataset.attrs['dt'] = 1 / rate
+                else:
+                    dtypes = [('t', np.float64), ('values', values.dtype)]
+                    data = np.empty(len(values), dtype=dtypes)
+                    data['t'] = t_i[i] + np.arange(len(values)) / rate
+                    data['values'] = values
+                    dataset = measurements.create_dataset(_ensure_str(label), data=data)
+                if self.int16_AI:
+                    dataset.attrs['scaling_coeffs'] = self.AI_scaling_coeffs[connection]
 
     def abort_buffered(self):
         return self.transition_to_manual(True)
@@ -672,6 +1222,7 @@ class NI_DAQmxWaitMonitorWorker(Worker):
         self.DO_task = None
         self.wait_table = None
         self.semiperiods = None
+        self.wait_latencies = None
         self.wait_monitor_thread = None
 
         # Saved error in case one occurs in the thread, we can raise it later in
@@ -749,6 +1300,14 @@ class NI_DAQmxWaitMonitorWorker(Worker):
                 # after each wait to the time of that wait plus pulse_width.
                 current_time = pulse_width = semiperiods[-1]
                 self.semiperiods.append(semiperiods[-1])
+                # The time on our clock of the start of the experiment, as best we can
+                # tell given that we only know of it once the initial pulse ends. This
+                # is late by however long it took to read that pulse, so the latencies
+                # measured from it are relative to that unknown latency, not absolute:
+                start_time = perf_counter() - pulse_width
+                # In low latency mode, read only the edge at the end of each wait before
+                # informing interested parties, and the one at the end of the pulse after:
+                n_edges = 1 if self.low_latency else 2
                 # Alright, we're now a short way into the experiment.
                 for wait in self.wait_table:
                     # How long until when the next wait should timeout?
@@ -756,7 +1315,7 @@ class NI_DAQmxWaitMonitorWorker(Worker):
                     timeout = max(timeout, 0)  # ensure non-negative
                     # Wait that long for the next pulse:
                     self.logger.debug('Waiting for pulse indicating end of wait')
-                    semiperiods = self.read_edges(2, timeout)
+                    semiperiods = self.read_edges(n_edges, timeout)
                     # Did the wait finish of its own accord, or time out?
                     if semiperiods is None:
                         # It timed out. If there is a timeout device, send a trigger to
@@ -774,14 +1333,22 @@ class NI_DAQmxWaitMonitorWorker(Worker):
                             self.logger.warning(dedent(msg))
                         # Keep waiting for the clock to resume:
                         self.logger.debug('Waiting for pulse indicating end of wait')
-                        semiperiods = self.read_edges(2, timeout=None)
+                        semiperiods = self.read_edges(n_edges, timeout=None)
                     # Alright, now we're at the end of the wait.
-                    self.semiperiods.extend(semiperiods)
+                    self.semiperiods.append(semiperiods[0])
+                    edge_time = sum(self.semiperiods)
                     self.logger.debug('Wait completed')
-                    current_time = wait['time'] + semiperiods[-1]
                     # Inform any interested parties that a wait has completed:
                     postdata = _ensure_str(wait['label'])
                     self.wait_completed.post(self.h5_file, data=postdata)
+                    post_time = perf_counter() - start_time
+                    self.wait_latencies.append((wait['label'], edge_time, post_time))
+                    if self.low_latency:
+                        semiperiods = self.read_edges(1, timeout=None)
+                    else:
+                        semiperiods = semiperiods[1:]
+                    self.semiperiods.extend(semiperiods)
+                    current_time = wait['time'] + semiperiods[-1]
                 # Inform any interested parties that waits have all finished:
                 self.logger.debug('All waits finished')
                 self.all_waits_finished.post(self.h5_file)
@@ -852,6 +1419,12 @@ class NI_DAQmxWaitMonitorWorker(Worker):
         self.CI_task.CreateCISemiPeriodChan(
             CI_chan, '', min_measure_time, max_measure_time, DAQmx_Val_Seconds, ""
         )
+        if self.low_latency:
+            # Transfer each sample from the device as soon as it is measured, and
+            # have reads poll for it rather than sleeping between checks:
+            self.CI_task.SetCIDataXferMech(CI_chan, DAQmx_Val_Interrupts)
+            self.CI_task.SetCIDataXferReqCond(CI_chan, DAQmx_Val_OnBrdMemNotEmpty)
+            self.CI_task.SetReadWaitMode(DAQmx_Val_Poll)
         num_edges = 2 * (len(self.wait_table) + 1)
         self.CI_task.CfgImplicitTiming(DAQmx_Val_ContSamps, num_edges)
         self.CI_task.StartTask()
@@ -884,6 +1457,9 @@ class NI_DAQmxWaitMonitorWorker(Worker):
 
         # An array to store the results of counter acquisition:
         self.semiperiods = []
+        # The label of each wait, the time of the edge that ended it and the time its
+        # completion was posted, both relative to the start of the experiment:
+        self.wait_latencies = []
         self.wait_monitor_thread = threading.Thread(target=self.wait_monitor)
         # Not a daemon thread, as it implements wait timeouts - we need it to stay alive
         # if other things die.
@@ -929,12 +1505,31 @@ class NI_DAQmxWaitMonitorWorker(Worker):
             data['timeout'] = self.wait_table['timeout']
             data['duration'] = wait_durations
             data['timed_out'] = waits_timed_out
+            # And how long after the edge ending each wait its completion was posted,
+            # relative to the unknown latency of reading the initial pulse:
+            dtypes = [
+                ('label', 'a256'),
+                ('edge_time', float),
+                ('post_time', float),
+                ('latency', float),
+            ]
+            latencies = np.empty(len(self.wait_latencies), dtype=dtypes)
+            for i, (label, edge_time, post_time) in enumerate(self.wait_latencies):
+                latencies[i] = (label, edge_time, post_time, post_time - edge_time)
             with h5py.File(self.h5_file, 'a') as hdf5_file:
                 hdf5_file.create_dataset('/data/waits', data=data)
+                dataset = hdf5_file.create_dataset('/data/wait_latencies', data=latencies)
+                dataset.attrs['low_latency'] = self.low_latency
+                dataset.attrs['latency_reference'] = (
+                    'post_time and latency are relative to the host reading the end '
+                    + 'of the initial pulse, not to the hardware edge, so exclude the '
+                    + 'unknown latency of that read'
+                )
             self.wait_durations_analysed.post(self.h5_file)
 
         self.h5_file = None
         self.semiperiods = None
+        self.wait_latencies = None
         return True
 
     def abort_buffered(self):
@@ -29,7 +29,6 @@ from labscript import (
     StaticAnalogOut,
     StaticDigitalOut,
     AnalogIn,
-    bitfield,
     config,
     compiler,
     LabscriptError,
@@ -37,7 +36,9 @@ from labscript import (
 )
 from labscript_utils import dedent
 from .utils import split_conn_DO, split_conn_AO, split_conn_AI
+import sys
 import numpy as np
+from numpy.lib.recfunctions import structured_to_unstructured
 
 _ints = {8: np.uint8, 16: np.uint16, 32: np.uint32, 64: np.uint64}
 
@@ -67,6 +68,8 @@ class NI_DAQmx(IntermediateDevice):
                 "clock_mirror_terminal",
                 "AI_range",
                 "AI_start_delay",
+                "AI_publisher_port",
+                "low_latency_wait_monitor",
                 "AO_range",
                 "max_AI_multi_chan_rate",
                 "max_AI_single_chan_rate",
@@ -84,7 +87,15 @@ class NI_DAQmx(IntermediateDevice):
                 "wait_monitor_minimum_pulse_width",
                 "wait_monitor_supports_wait_completed_events",
             ],
-            "device_properties": ["acquisition_rate"],
+            "device_properties": [
+                "acquisition_rate",
+                "int16_AO",
+                "streaming_chunk_size",
+                "homogeneous_output_tables",
+                "AI_trigger_terminal",
+                "implicit_AI_times",
+                "int16_AI",
+            ],
         }
     )
     def __init__(
@@ -112,9 +123,74 @@ class NI_DAQmx(IntermediateDevice):
         supports_buffered_AO=False,
         supports_buffered_DO=False,
         supports_semiperiod_measurement=False,
+        int16_AO=False,
+        streaming_chunk_size=None,
+        homogeneous_output_tables=False,
+        AI_trigger_terminal=None,
+        implicit_AI_times=False,
+        int16_AI=False,
+        AI_publisher_port=None,
+        low_latency_wait_monitor=False,
         **kwargs
     ):
-        """Generic class for NI_DAQmx devices."""
+        """Generic class for NI_DAQmx devices.
+
+        If int16_AO=True, analog output is saved as 16 bit integers scaled to the
+        output range, rather than as floating point voltages. This is only a more
+        compact storage format: it halves the size of the shot file's output table,
+        but the integers are voltages in units of volts_per_code, not the device's DAC
+        codes, since its calibration is only known to BLACS. BLACS still converts the
+        table to DAC codes every shot, in place of DAQmx's own scaling, and since
+        volts_per_code is about the size of one DAC code, rounding twice means outputs
+        may be up to about one code further from the requested voltage than they
+        would be otherwise.
+
+        If streaming_chunk_size is not None, BLACS streams buffered output to the
+        device in chunks of this many samples while the shot runs, rather than writing
+        it all before the shot starts. This allows shots with more samples than fit in
+        memory, and to start sooner. Output tables are saved to the shot file in chunks
+        of this size so that they can be read efficiently.
+
+        If homogeneous_output_tables=True, output tables are saved as 2D arrays with
+        one column per channel, named by the dataset's 'channels' attribute, rather
+        than as structured arrays. BLACS can then read them directly into the arrays
+        it passes to DAQmx, without converting them to that layout itself.
+
+        If AI_trigger_terminal is not None, analog inputs are only sampled during the
+        windows of time requested by their acquisitions, rather than for the whole
+        shot. Each window starts at a rising edge on this terminal, which should be
+        connected to an output, such as a Trigger, that is pulsed at the start time of
+        every acquisition. Acquisitions starting at the same time share a window, and
+        every window is as long as the longest of them, so windows may not overlap,
+        and there may not be waits within them.
+
+        If implicit_AI_times=True, each acquired trace is saved to the shot file as
+        an array of its values only, with the time of its first sample and the interval
+        between samples in its 't0' and 'dt' attributes, rather than as an array of
+        ('t', 'values') pairs. This makes the traces a third of the size, but they
+        cannot then be read with lyse's Run.get_trace().
+
+        If int16_AI=True, analog input is acquired as raw 16 bit ADC codes, and traces
+        are saved as such, with the coefficients of the polynomial converting them to
+        volts in their 'scaling_coeffs' attribute. This makes them smaller and faster to
+        save without losing precision. Use NI_DAQmx.utils.get_AI_trace() to read traces
+        in volts, whichever way they were saved.
+
+        If AI_publisher_port is not None, BLACS publishes the analog input data it
+        acquires in manual mode on a ZMQ socket bound to this port on localhost, for
+        monitoring tools to subscribe to. See NI_DAQmx.blacs_workers.AIPublisher for
+        the message format.
+
+        If low_latency_wait_monitor=True and this device is the wait monitor
+        acquisition device, BLACS detects the end of each wait with as little latency
+        as possible, at the cost of a CPU core busy polling the device during the shot.
+        Either way, the latency with which the end of each wait was detected is saved
+        to the shot file. This is relative rather than absolute: the host has no clock
+        shared with the device, so the start of the shot on the host's clock is taken
+        to be when the initial pulse from the master pseudoclock was read, less its
+        width. Each latency therefore excludes the latency of reading that pulse, which
+        is unknown, and is useful for comparing waits, shots, and settings, rather than
+        as the true delay since the edge ending the wait."""
 
         # Default static output setting based on whether the device supports buffered
         # output:
@@ -141,6 +217,12 @@ class NI_DAQmx(IntermediateDevice):
             msg = """acquisition_rate %f is larger than the maximum single-channel rate
                 %f for this device"""
             raise ValueError(dedent(msg) % (acquisition_rate, max_AI_single_chan_rate))
+        if AI_publisher_port is not None and num_AI == 0:
+            msg = "Cannot set AI_publisher_port on device with no analog inputs"
+            raise ValueError(msg)
+        if AI_trigger_terminal is not None and num_AI == 0:
+            msg = "Cannot set AI_trigger_terminal on device with no analog inputs"
+            raise ValueError(msg)
 
         self.clock_terminal = clock_terminal
         self.MAX_name = MAX_name if MAX_name is not None else name
@@ -148,6 +230,14 @@ class NI_DAQmx(IntermediateDevice):
         self.static_DO = static_DO
 
         self.acquisition_rate = acquisition_rate
+        self.int16_AO = int16_AO
+        if streaming_chunk_size is not None and streaming_chunk_size < 1:
+            raise ValueError('streaming_chunk_size must be a positive integer or None')
+        self.streaming_chunk_size = streaming_chunk_size
+        self.homogeneous_output_tables = homogeneous_output_tables
+        self.AI_trigger_terminal = AI_trigger_terminal
+        self.implicit_AI_times = implicit_AI_times
+        self.int16_AI = int16_AI
         self.AO_range = AO_range
         self.max_AI_multi_chan_rate = max_AI_multi_chan_rate
         self.max_AI_single_chan_rate = max_AI_single_chan_rate
@@ -316,16 +406,58 @@ class NI_DAQmx(IntermediateDevice):
         msg = msg % (self.acquisition_rate, self.name, n, self.max_AI_multi_chan_rate)
         raise ValueError(dedent(msg))
 
+    def _AI_samples_per_window(self, AI_table):
+        """If AI_trigger_terminal is set, return the number of samples acquired in
+        each window, enough for the longest window of acquisitions starting at the same
+        time. Raise LabscriptError if the windows overlap or contain waits."""
+        if AI_table is None or self.AI_trigger_terminal is None or not len(AI_table):
+            return None
+        starts = np.unique(AI_table['start'])
+        stops = np.array([AI_table['stop'][AI_table['start'] == t].max() for t in starts])
+        # Samples are taken AI_start_delay after each trigger, with a tolerance for
+        # float error in the time of the last one:
+        durations = stops - starts - self.AI_start_delay
+        samples = np.floor(durations * self.acquisition_rate + 1e-9).astype(int) + 1
+        samples_per_window = max(1, samples.max())
+        window_duration = samples_per_window / self.acquisition_rate
+        window_ends = starts + self.AI_start_delay + window_duration
+        if np.any(starts[1:] < window_ends[:-1]):
+            msg = """Acquisitions on device %s with AI_trigger_terminal set must start
+                at the same time or after the end of any previous acquisitions, each of
+                which lasts %d samples, the number needed for the longest."""
+            raise LabscriptError(dedent(msg) % (self.name, samples_per_window))
+        for wait_time in compiler.wait_table:
+            if np.any((starts <= wait_time) & (wait_time < window_ends)):
+                msg = """Device %s has AI_trigger_terminal set, and so cannot
+                    acquire during the wait at t = %s."""
+                raise LabscriptError(dedent(msg) % (self.name, wait_time))
+        return samples_per_window
+
+    def _AO_volts_per_code(self):
+        """The voltage of one unit of the analog output table if int16_AO=True, with
+        the larger in magnitude of the ends of the output range at full scale. This is
+        not the voltage of one DAC code, which depends on the device's calibration"""
+        vmin, vmax = self.AO_range
+        return max(abs(vmin), abs(vmax)) / np.iinfo(np.int16).max
+
     def _make_analog_out_table(self, analogs, times):
         """Collect analog output data and create the output array"""
         if not analogs:
             return None
         n_timepoints = 1 if self.static_AO else len(times)
         connections = sorted(analogs, key=split_conn_AO)
-        dtypes = [(c, np.float32) for c in connections]
+        if self.int16_AO:
+            dtypes = [(c, np.int16) for c in connections]
+        else:
+            dtypes = [(c, np.float32) for c in connections]
         analog_out_table = np.empty(n_timepoints, dtype=dtypes)
         for connection, output in analogs.items():
-            analog_out_table[connection] = output.raw_output
+            if self.int16_AO:
+                analog_out_table[connection] = np.rint(
+                    output.raw_output / self._AO_volts_per_code()
+                )
+            else:
+                analog_out_table[connection] = output.raw_output
         return analog_out_table
 
     def _make_digital_out_table(self, digitals, times):
@@ -333,31 +465,23 @@ class NI_DAQmx(IntermediateDevice):
         if not digitals:
             return None
         n_timepoints = 1 if self.static_DO else len(times)
-        # List of output bits by port number:
-        bits_by_port = {}
-        # table names and dtypes by port number:
+        # Table column names and dtypes by port number. Each port's column is the
+        # smallest integer type that has at least as many bits as the port has lines:
         columns = {}
-        for connection, output in digitals.items():
-            port, line = split_conn_DO(connection)
+        for connection in digitals:
+            port, _ = split_conn_DO(connection)
             port_str = 'port%d' % port
-            if port not in bits_by_port:
-                # Make a list of the right size for the number of lines
-                # on the port, or the number of bits in the smallest integer
-                # type that is equal to or larger than the number of lines.
-                nlines = self.ports[port_str]["num_lines"]
-                int_type = _smallest_int_type(nlines)
-                int_type_nbits = 8 * int_type().nbytes
-                columns[port] = (port_str, int_type)
-                bits_by_port[port] = [0] * int_type_nbits
-            bits_by_port[port][line] = output.raw_output
+            nlines = self.ports[port_str]["num_lines"]
+            columns[port] = (port_str, _smallest_int_type(nlines))
         dtypes = [columns[port] for port in sorted(columns)]
-        digital_out_table = np.empty(n_timepoints, dtype=dtypes)
-        for port, bits in bits_by_port.items():
-            # Pack the bits from each port into an integer:
+        digital_out_table = np.zeros(n_timepoints, dtype=dtypes)
+        # Pack the bits of each output straight into its port's column:
+        for connection, output in digitals.items():
+            port, line = split_conn_DO(connection)
             port_str, dtype = columns[port]
-            values = bitfield(bits, dtype=dtype)
-            # Put them into the table:
-            digital_out_table[port_str] = np.array(values)
+            bits = output.raw_output.astype(dtype)
+            bits <<= line
+            digital_out_table[port_str] |= bits
         return digital_out_table
 
     def _make_analog_input_table(self, inputs):
@@ -449,6 +573,27 @@ class NI_DAQmx(IntermediateDevice):
                 device only."""
             raise RuntimeError(dedent(msg))
 
+    def _create_output_dataset(self, grp, name, table):
+        """Save an output table, in chunks of streaming_chunk_size samples if
+        streaming, and as a 2D array if homogeneous_output_tables=True. Since BLACS only
+        reads a streamed table a chunk at a time, we also record whether it is all
+        zeros, which BLACS needs to know in advance."""
+        channels = table.dtype.names
+        data = table
+        if self.homogeneous_output_tables:
+            # Columns all of the largest of the channels' types:
+            data = structured_to_unstructured(table)
+        if self.streaming_chunk_size is None:
+            dataset = grp.create_dataset(name, data=data, compression=config.compression)
+        else:
+            chunks = (min(self.streaming_chunk_size, len(table)),) + data.shape[1:]
+            dataset = grp.create_dataset(
+                name, data=data, compression=config.compression, chunks=chunks
+            )
+            dataset.attrs['all_zero'] = not any(np.any(table[c]) for c in channels)
+        if self.homogeneous_output_tables:
+            dataset.attrs['channels'] = [c.encode('utf8') for c in channels]
+
     def generate_code(self, hdf5_file):
         IntermediateDevice.generate_code(self, hdf5_file)
         analogs = {}
@@ -483,15 +628,39 @@ class NI_DAQmx(IntermediateDevice):
         AI_table = self._make_analog_input_table(inputs)
 
         self._check_AI_not_too_fast(AI_table)
+        AI_samples_per_window = self._AI_samples_per_window(AI_table)
         self._check_wait_monitor_timeout_device_config()
 
         grp = self.init_device_group(hdf5_file)
         if AO_table is not None:
-            grp.create_dataset('AO', data=AO_table, compression=config.compression)
+            self._create_output_dataset(grp, 'AO', AO_table)
+            if self.int16_AO:
+                grp['AO'].attrs['volts_per_code'] = self._AO_volts_per_code()
         if DO_table is not None:
-            grp.create_dataset('DO', data=DO_table, compression=config.compression)
+            self._create_output_dataset(grp, 'DO', DO_table)
         if AI_table is not None:
             grp.create_dataset('AI', data=AI_table, compression=config.compression)
+            if AI_samples_per_window is not None:
+                grp['AI'].attrs['samples_per_window'] = AI_samples_per_window
+
+
+# The model subclasses can also be imported from this module. Where supported, they
+# are imported from .models only on first access rather than all at once. Importing
+# .models itself only reads the list of models from capabilities.json:
+from . import models as _models
+
+# NI_DAQmx.__name__ rather than a literal, since on Python 2 these must be str, not
+# unicode:
+__all__ = [NI_DAQmx.__name__] + _models.__all__
+
+if sys.version_info >= (3, 7):
+    def __getattr__(name):
+        if name in _models.__all__:
+            return _models._import_model(name)
+        raise AttributeError("module %r has no attribute %r" % (__name__, name))
 
+    def __dir__():
+        return sorted(set(globals()) | set(__all__))
 
-from .models import *
+else:
+    from .models import *
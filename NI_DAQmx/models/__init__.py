@@ -18,7 +18,9 @@ if PY2:
     str = unicode
 
 import os
+import sys
 import json
+import types
 from labscript_devices import import_class_by_fullname
 
 THIS_FOLDER = os.path.dirname(os.path.abspath(__file__))
@@ -30,11 +32,47 @@ if os.path.exists(CAPABILITIES_FILE):
         capabilities = json.load(f)
 
 __all__ = []
-# Import all subclasses into the global namespace:
 for model_name in capabilities:
     class_name = 'NI_' + model_name.replace('-', '_')
-    path = 'labscript_devices.NI_DAQmx.models.' + class_name + '.' + class_name
     if PY2 and isinstance(class_name, str):
         class_name = class_name.encode('utf8')
-    globals()[class_name] = import_class_by_fullname(path)
-    __all__.append(class_name)
\ No newline at end of file
+    __all__.append(class_name)
+
+
+def _import_model(class_name):
+    """Import the model subclass of the given name and bind it as an attribute of this
+    module, replacing the submodule of the same name if that was imported first"""
+    path = 'labscript_devices.NI_DAQmx.models.' + class_name + '.' + class_name
+    cls = import_class_by_fullname(path)
+    if not isinstance(cls, type):
+        raise TypeError('%s is not a class' % path)
+    globals()[class_name] = cls
+    return cls
+
+
+if sys.version_info >= (3, 7):
+    # Import each subclass only when it is first accessed as an attribute of this
+    # module, so that using one or two models does not require importing them all:
+    def __getattr__(name):
+        if name in __all__:
+            return _import_model(name)
+        raise AttributeError("module %r has no attribute %r" % (__name__, name))
+
+    def __dir__():
+        return sorted(set(globals()) | set(__all__))
+
+    class _ModelsModule(types.ModuleType):
+        def __setattr__(self, name, value):
+            # Importing a model's submodule binds it as an attribute of this package,
+            # which would hide the class of the same name from __getattr__. Bind the
+            # class instead, as it was when all subclasses were imported eagerly:
+            if name in __all__ and isinstance(value, types.ModuleType):
+                value = getattr(value, name)
+            types.ModuleType.__setattr__(self, name, value)
+
+    sys.modules[__name__].__class__ = _ModelsModule
+
+else:
+    # No module-level __getattr__, import all subclasses into the global namespace:
+    for class_name in __all__:
+        _import_model(class_name)
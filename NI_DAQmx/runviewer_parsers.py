@@ -5,6 +5,56 @@ import numpy as np
 import labscript_utils.properties as properties
 from labscript_utils import dedent, VersionException
 
+from .utils import structured_view
+
+
+def read_output_table(dataset):
+    """Read an output table as a structured array, whether or not it is saved as a 2D
+    array"""
+    table = dataset[:]
+    if 'channels' in dataset.attrs:
+        table = structured_view(table, dataset.attrs['channels'])
+    return table
+
+
+class LazyTrace(object):
+    """A (times, values) trace whose values are only computed, by calling
+    get_values(), the first time they are accessed. runviewer only accesses the traces
+    of channels that are displayed."""
+
+    def __init__(self, times, get_values):
+        self.times = times
+        self._get_values = get_values
+        self._values = None
+
+    @property
+    def values(self):
+        if self._values is None:
+            self._values = self._get_values()
+            self._get_values = None
+        return self._values
+
+    def __len__(self):
+        return 2
+
+    def __getitem__(self, index):
+        return (self.times, self.values)[index]
+
+    def __iter__(self):
+        return iter((self.times, self.values))
+
+
+def unpack_port(port_values, num_lines):
+    """Return an array of shape (len(port_values), num_lines) of the digital values,
+    as uint8, of each line of a port from the packed integer values of the port"""
+    itemsize = port_values.dtype.itemsize
+    big_endian = np.ascontiguousarray(port_values, dtype='>u%d' % itemsize)
+    as_bytes = big_endian.view(np.uint8).reshape(-1, itemsize)
+    # Most significant bit first. Reversed rather than using the bitorder argument,
+    # which requires numpy 1.17:
+    bits = np.unpackbits(as_bytes, axis=1)
+    return bits[:, ::-1][:, :num_lines]
+
 
 class NI_DAQmxParser(object):
     def __init__(self, path, device):
@@ -19,12 +69,14 @@ class NI_DAQmxParser(object):
             group = f['devices/' + self.name]
 
             if 'AO' in group:
-                AO_table = group['AO'][:]
+                AO_table = read_output_table(group['AO'])
+                # Present if the table is saved as integers rather than volts:
+                AO_volts_per_code = group['AO'].attrs.get('volts_per_code', None)
             else:
                 AO_table = None
 
             if 'DO' in f['devices/%s' % self.name]:
-                DO_table = group['DO'][:]
+                DO_table = read_output_table(group['DO'])
             else:
                 DO_table = None
 
@@ -52,30 +104,46 @@ class NI_DAQmxParser(object):
             clock_indices = np.insert(clock_indices, 0, 0)
         clock_ticks = times[clock_indices]
 
+        def static_values(value):
+            # Only the value is stored until the trace is accessed:
+            return lambda: np.full(len(clock_ticks), value, dtype=float)
+
         traces = {}
 
         if DO_table is not None:
             ports_in_use = DO_table.dtype.names
             for port_str in ports_in_use:
-                for line in range(ports[port_str]["num_lines"]):
-                    # Extract each digital value from the packed bits:
-                    line_vals = (((1 << line) & DO_table[port_str]) != 0).astype(float)
+                # Extract the digital values of all lines from the packed bits at once:
+                num_lines = ports[port_str]["num_lines"]
+                if static_DO:
+                    line_vals = unpack_port(DO_table[port_str][:1], num_lines)[0]
+                else:
+                    line_vals = unpack_port(DO_table[port_str], num_lines)
+                for line in range(num_lines):
                     if static_DO:
-                        line_vals = np.full(len(clock_ticks), line_vals[0])
-                    traces['%s/line%d' % (port_str, line)] = (clock_ticks, line_vals)
+                        get_values = static_values(line_vals[line])
+                    else:
+                        get_values = lambda col=line_vals[:, line]: col.astype(float)
+                    trace = LazyTrace(clock_ticks, get_values)
+                    traces['%s/line%d' % (port_str, line)] = trace
 
         if AO_table is not None:
+            scale = 1 if AO_volts_per_code is None else AO_volts_per_code
             for chan in AO_table.dtype.names:
                 vals = AO_table[chan]
                 if static_AO:
-                    vals = np.full(len(clock_ticks), vals[0])
-                traces[chan] = (clock_ticks, vals)
+                    get_values = static_values(vals[0] * scale)
+                else:
+                    get_values = lambda vals=vals: vals * scale
+                traces[chan] = LazyTrace(clock_ticks, get_values)
 
         triggers = {}
         for channel_name, channel in self.device.child_list.items():
             if channel.parent_port in traces:
                 trace = traces[channel.parent_port]
                 if channel.device_class == 'Trigger':
+                    # Triggers are used to parse other devices, so don't defer them:
+                    trace = tuple(trace)
                     triggers[channel_name] = trace
                 add_trace(channel_name, trace, self.name, channel.parent_port)
 
@@ -16,7 +16,9 @@ from labscript_utils import PY2
 if PY2:
     str = unicode
 
+import numpy as np
 from labscript_utils import dedent
+from labscript_utils.connections import _ensure_str
 
 
 def split_conn_DO(connection):
@@ -78,3 +80,30 @@ def split_conn_port(connection):
     except (ValueError, IndexError):
         msg = "port string %s does not match format 'port<N>' for integer N"
         raise ValueError(msg % str(connection))
+
+
+def structured_view(table, channels):
+    """Return a view of a C-contiguous 2D output table, saved with one column per
+    channel, as a 1D structured array with one field per channel, as output tables are
+    otherwise saved. channels may be the bytes or str names of the channels, as read
+    from the 'channels' attribute of the table's dataset"""
+    dtype = np.dtype([(_ensure_str(c), table.dtype) for c in channels])
+    return table.view(dtype)[:, 0]
+
+
+def get_AI_trace(dataset):
+    """Return the times and values in volts of an analog input trace saved by an
+    NI_DAQmx device, given its dataset in the shot file. This works for traces saved
+    with or without their times, and as volts or raw ADC codes, depending on the
+    implicit_AI_times and int16_AI settings of the device"""
+    data = dataset[:]
+    if data.dtype.names is None:
+        # Only values saved, with the times implied:
+        values = data
+        times = dataset.attrs['t0'] + np.arange(len(values)) * dataset.attrs['dt']
+    else:
+        times = data['t']
+        values = data['values']
+    if 'scaling_coeffs' in dataset.attrs:
+        values = np.polynomial.polynomial.polyval(values, dataset.attrs['scaling_coeffs'])
+    return times, values
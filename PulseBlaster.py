@@ -15,7 +15,7 @@ from labscript_utils import PY2
 if PY2:
     str = unicode
 
-from labscript_devices import BLACS_tab, runviewer_parser
+from labscript_devices import runviewer_parser, deprecated_import_alias
 from labscript_utils import dedent
 
 from labscript import (
@@ -37,8 +37,18 @@ from labscript import (
 import numpy as np
 
 import labscript_utils.h5_lock, h5py
+import labscript_utils.properties as properties
 
-import time
+import os
+import threading
+import functools
+from contextlib import contextmanager
+from collections import OrderedDict
+try:
+    from time import perf_counter
+except ImportError:
+    # Python 2:
+    from time import time as perf_counter
 
 class PulseBlasterDDS(DDSQuantity):
     description = 'PulseBlasterDDS'
@@ -64,46 +74,102 @@ class PulseBlasterDDS(DDSQuantity):
         self.phase_reset.go_low(t)
 
 
+# Opt-in timing of the stages of compiling, programming and parsing pulse programs,
+# for finding performance regressions. This is off by default, in which case profiled
+# functions only check a flag before being called. Turn it on with enable_profiling(),
+# or by setting the environment variable PULSEBLASTER_PROFILE in the process concerned,
+# such as runmanager's compiler or BLACS. Statistics for each stage are accumulated
+# across all threads until reset_profiles() is called, except when compiling, where
+# profile_shot() resets them so that each shot file records only its own stages.
+profiling_enabled = bool(os.environ.get('PULSEBLASTER_PROFILE'))
 profiles = {}
+_profiles_lock = threading.Lock()
+
+def enable_profiling(enabled=True):
+    global profiling_enabled
+    profiling_enabled = enabled
+
+def reset_profiles():
+    with _profiles_lock:
+        profiles.clear()
+
+def _record_profile(name, runtime):
+    with _profiles_lock:
+        if name not in profiles:
+            profiles[name] = {'num_calls':0, 'total_time':0, 'min':runtime, 'max':runtime}
+        stats = profiles[name]
+        stats['num_calls'] += 1
+        stats['total_time'] += runtime
+        stats['min'] = min(stats['min'], runtime)
+        stats['max'] = max(stats['max'], runtime)
+
+@contextmanager
+def profile_stage(name):
+    """Time the enclosed block as the stage called name, if profiling is enabled"""
+    if not profiling_enabled:
+        yield
+        return
+    start_time = perf_counter()
+    try:
+        yield
+    finally:
+        _record_profile(name, perf_counter() - start_time)
+
 def profile(funct):
-    func = funct.__name__
-    if func not in profiles:
-        profiles[func] = {'total_time':0, 'min':None, 'max':0, 'num_calls':0, 'average_time_per_call':0}
-    
-    def new_func(*args,**kwargs):
-        start_time = time.time()
-        ret = funct(*args,**kwargs)
-        runtime = time.time()-start_time
-        profiles[func]['total_time'] += runtime
-        profiles[func]['num_calls'] += 1
-        profiles[func]['min'] = profiles[func]['min'] if profiles[func]['min'] is not None and profiles[func]['min'] < runtime else runtime
-        profiles[func]['max'] = profiles[func]['max'] if profiles[func]['max'] > runtime else runtime
-        profiles[func]['average_time_per_call'] = profiles[func]['total_time']/profiles[func]['num_calls']
-        
-        return ret
-    # return new_func
-    return funct
-    
-def start_profile(name):
-    if name not in profiles:
-        profiles[name] = {'total_time':0, 'min':None, 'max':0, 'num_calls':0, 'average_time_per_call':0}
-        
-    if 'start_time' in profiles[name]:
-        raise Exception('You cannot call start_profile for %s without first calling stop_profile'%name)
-        
-    profiles[name]['start_time'] = time.time()
-    
-def stop_profile(name):
-    if name not in profiles or 'start_time' not in profiles[name]:
-        raise Exception('You must first call start_profile for %s before calling stop_profile')
-        
-    runtime = time.time()-profiles[name]['start_time']
-    del profiles[name]['start_time']
-    profiles[name]['total_time'] += runtime
-    profiles[name]['num_calls'] += 1
-    profiles[name]['min'] = profiles[name]['min'] if profiles[name]['min'] is not None and profiles[name]['min'] < runtime else runtime
-    profiles[name]['max'] = profiles[name]['max'] if profiles[name]['max'] > runtime else runtime
-    profiles[name]['average_time_per_call'] = profiles[name]['total_time']/profiles[name]['num_calls']
+    """Decorator timing each call to funct as a stage named after it, if profiling is
+    enabled"""
+    name = getattr(funct, '__qualname__', funct.__name__)
+
+    @functools.wraps(funct)
+    def new_func(*args, **kwargs):
+        if not profiling_enabled:
+            return funct(*args, **kwargs)
+        start_time = perf_counter()
+        try:
+            return funct(*args, **kwargs)
+        finally:
+            _record_profile(name, perf_counter() - start_time)
+    return new_func
+
+def get_profiles():
+    """Return a copy of the statistics for each stage timed so far, in seconds"""
+    with _profiles_lock:
+        return {name: dict(stats, average_time_per_call=stats['total_time']/stats['num_calls'])
+                for name, stats in profiles.items()}
+
+def format_profiles():
+    """Return the statistics for each stage timed so far as a string suitable for
+    logging"""
+    lines = []
+    for name, stats in sorted(get_profiles().items()):
+        lines.append('%s: %d calls, total %.6f s, average %.6f s, min %.6f s, max %.6f s' % (
+            name, stats['num_calls'], stats['total_time'], stats['average_time_per_call'],
+            stats['min'], stats['max']))
+    return '\n'.join(lines)
+
+def save_profiles(group):
+    """Write the statistics for each stage timed so far to a PROFILE dataset in the given
+    h5py group, such as a device's group in the shot file"""
+    profile_dtype = [('stage', 'a256'), ('num_calls', np.int64), ('total_time', np.float64),
+                     ('average_time_per_call', np.float64), ('min', np.float64), ('max', np.float64)]
+    stats = get_profiles()
+    table = np.empty(len(stats), dtype=profile_dtype)
+    for i, name in enumerate(sorted(stats)):
+        table[i] = (name.encode('utf8'), stats[name]['num_calls'], stats[name]['total_time'],
+                    stats[name]['average_time_per_call'], stats[name]['min'], stats[name]['max'])
+    group.create_dataset('PROFILE', data=table)
+
+@contextmanager
+def profile_shot(group):
+    """If profiling is enabled, reset the statistics, and on exit write those for the
+    stages timed within the enclosed block to the given h5py group, as for
+    save_profiles(). Otherwise do nothing"""
+    if not profiling_enabled:
+        yield
+        return
+    reset_profiles()
+    yield
+    save_profiles(group)
 
 
 class PulseBlaster(PseudoclockDevice):
@@ -115,6 +181,17 @@ class PulseBlaster(PseudoclockDevice):
                        'BRANCH':     6,
                        'LONG_DELAY': 7,
                        'WAIT':       8}
+
+    # The maximum number of repetitions of a single LOOP instruction. Longer loops
+    # are made out of nested loops:
+    max_loop_reps = 1048576
+
+    pb_dtype = [('freq0', np.int32), ('phase0', np.int32), ('amp0', np.int32), 
+                ('dds_en0', np.int32), ('phase_reset0', np.int32),
+                ('freq1', np.int32), ('phase1', np.int32), ('amp1', np.int32),
+                ('dds_en1', np.int32), ('phase_reset1', np.int32),
+                ('flags', np.int32), ('inst', np.int32),
+                ('inst_data', np.int32), ('length', np.float64)]
                        
     description = 'PB-DDSII-300'
     clock_limit = 8.3e6 # Slight underestimate I think.
@@ -136,14 +213,18 @@ class PulseBlaster(PseudoclockDevice):
     allowed_children = [Pseudoclock]
     
     @set_passed_properties(
-        property_names = {"connection_table_properties": ["firmware",  "programming_scheme"],
+        property_names = {"connection_table_properties": ["firmware",  "programming_scheme",
+                                                          "runviewer_change_points_only"],
                           "device_properties": ["pulse_width", "max_instructions",
                                                 "time_based_stop_workaround",
-                                                "time_based_stop_workaround_extra_time"]}
+                                                "time_based_stop_workaround_extra_time",
+                                                "optimise_pulse_program", "program_banks"]}
         )
     def __init__(self, name, trigger_device=None, trigger_connection=None, board_number=0, firmware = '',
                  programming_scheme='pb_start/BRANCH', pulse_width='symmetric', max_instructions=4000,
-                 time_based_stop_workaround=False, time_based_stop_workaround_extra_time=0.5, **kwargs):
+                 time_based_stop_workaround=False, time_based_stop_workaround_extra_time=0.5,
+                 optimise_pulse_program=False, program_banks=1,
+                 runviewer_change_points_only=False, **kwargs):
         PseudoclockDevice.__init__(self, name, trigger_device, trigger_connection, **kwargs)
         self.BLACS_connection = board_number
         # TODO: Implement capability checks based on firmware revision of PulseBlaster
@@ -227,6 +308,25 @@ class PulseBlaster(PseudoclockDevice):
         self.pulse_width = pulse_width
         self.max_instructions = max_instructions
 
+        # If optimise_pulse_program=True, the pulse program is passed through
+        # optimise_pb_inst() before checking it fits in max_instructions, which merges
+        # adjacent equivalent instructions without changing the output timing:
+        self.optimise_pulse_program = optimise_pulse_program
+
+        # If program_banks > 1, BLACS keeps up to that many distinct pulse programs
+        # in the PulseBlaster's memory at once, evicting the least recently used when
+        # it runs out of space. A shot whose pulse program is already resident then
+        # branches to it instead of reprogramming the board, which saves time when a
+        # sequence alternates between a few different shots:
+        if not isinstance(program_banks, (int, np.integer)) or program_banks < 1:
+            raise LabscriptError('program_banks must be a positive integer')
+        self.program_banks = program_banks
+
+        # If runviewer_change_points_only=True, runviewer shows the outputs of this
+        # PulseBlaster with only the samples at which they change, which is faster for
+        # long shots. See PulseBlasterParser.change_points_only:
+        self.runviewer_change_points_only = runviewer_change_points_only
+
         # Create the internal pseudoclock
         self._pseudoclock = Pseudoclock('%s_pseudoclock'%name, self, 'clock') # possibly a better connection name than 'clock'?
         # Create the internal direct output clock_line
@@ -325,7 +425,12 @@ class PulseBlaster(PseudoclockDevice):
                 
         return dig_outputs, dds_outputs
 
+    @profile
     def generate_registers(self, hdf5_file, dds_outputs):
+        """Write the frequency, amplitude and phase register tables of each DDS to the
+        shot file. Return dictionaries, keyed by DDS number, of arrays of the register
+        number to be used for each sample of the frequency, amplitude and phase
+        outputs of each DDS in use."""
         ampdicts = {}
         phasedicts = {}
         freqdicts = {}
@@ -340,13 +445,13 @@ class PulseBlaster(PseudoclockDevice):
                 output = dds_dict[num]
             
                 # Ensure that amplitudes are within bounds:
-                if any(output.amplitude.raw_output > 1)  or any(output.amplitude.raw_output < 0):
+                if np.any((output.amplitude.raw_output > 1) | (output.amplitude.raw_output < 0)):
                     raise LabscriptError('%s %s '%(output.amplitude.description, output.amplitude.name) +
                                       'can only have values between 0 and 1, ' + 
                                       'the limit imposed by %s.'%output.name)
                                       
                 # Ensure that frequencies are within bounds:
-                if any(output.frequency.raw_output > 150e6 )  or any(output.frequency.raw_output < 0):
+                if np.any((output.frequency.raw_output > 150e6) | (output.frequency.raw_output < 0)):
                     raise LabscriptError('%s %s '%(output.frequency.description, output.frequency.name) +
                                       'can only have values between 0Hz and and 150MHz, ' + 
                                       'the limit imposed by %s.'%output.name)
@@ -354,15 +459,16 @@ class PulseBlaster(PseudoclockDevice):
                 # Ensure that phase wraps around:
                 output.phase.raw_output %= 360
                 
-                amps = set(output.amplitude.raw_output)
-                phases = set(output.phase.raw_output)
-                freqs = set(output.frequency.raw_output)
+                # The distinct values, and the index into them of each sample:
+                amps, ampregs = np.unique(output.amplitude.raw_output, return_inverse=True)
+                phases, phaseregs = np.unique(output.phase.raw_output, return_inverse=True)
+                freqs, freqregs = np.unique(output.frequency.raw_output, return_inverse=True)
             else:
                 # If the DDS is unused, it will use the following values
                 # for the whole experimental run:
-                amps = set([0])
-                phases = set([0])
-                freqs = set([0])
+                amps = np.zeros(1)
+                phases = np.zeros(1)
+                freqs = np.zeros(1)
                                   
             if len(amps) > 1024:
                 raise LabscriptError('%s dds%d can only support 1024 amplitude registers, and %s have been requested.'%(self.name, num, str(len(amps))))
@@ -371,21 +477,18 @@ class PulseBlaster(PseudoclockDevice):
             if len(freqs) > 1024:
                 raise LabscriptError('%s dds%d can only support 1024 frequency registers, and %s have been requested.'%(self.name, num, str(len(freqs))))
                                 
-            # start counting at 1 to leave room for the dummy instruction,
-            # which BLACS will fill in with the state of the front
-            # panel:
-            ampregs = range(1,len(amps)+1)
-            freqregs = range(1,len(freqs)+1)
-            phaseregs = range(1,len(phases)+1)
-            
-            ampdicts[num] = dict(zip(amps,ampregs))
-            freqdicts[num] = dict(zip(freqs,freqregs))
-            phasedicts[num] = dict(zip(phases,phaseregs))
+            if num in dds_dict:
+                # start counting at 1 to leave room for the dummy instruction,
+                # which BLACS will fill in with the state of the front
+                # panel:
+                ampdicts[num] = ampregs.reshape(-1) + 1
+                freqdicts[num] = freqregs.reshape(-1) + 1
+                phasedicts[num] = phaseregs.reshape(-1) + 1
             
             # The zeros are the dummy instructions:
-            freq_table = np.array([0] + list(freqs), dtype = np.float64) / 1e6 # convert to MHz
-            amp_table = np.array([0] + list(amps), dtype = np.float32)
-            phase_table = np.array([0] + list(phases), dtype = np.float64)
+            freq_table = np.concatenate([[0], freqs]).astype(np.float64) / 1e6 # convert to MHz
+            amp_table = np.concatenate([[0], amps]).astype(np.float32)
+            phase_table = np.concatenate([[0], phases]).astype(np.float64)
             
             subgroup = group.create_group('DDS%d'%num)
             subgroup.create_dataset('FREQ_REGS', compression=config.compression, data = freq_table)
@@ -394,179 +497,190 @@ class PulseBlaster(PseudoclockDevice):
             
         return freqdicts, ampdicts, phasedicts
         
+    @profile
     def convert_to_pb_inst(self, dig_outputs, dds_outputs, freqs, amps, phases):
-        pb_inst = []
-        
-        # index to keep track of where in output.raw_output the
-        # pulseblaster flags are coming from
-        # starts at -1 because the internal flag should always tick on the first instruction and be 
-        # incremented (to 0) before it is used to index any arrays
-        i = -1 
-        # index to record what line number of the pulseblaster hardware
-        # instructions we're up to:
-        j = 0
-        # We've delegated the initial two instructions off to BLACS, which
-        # can ensure continuity with the state of the front panel. Thus
-        # these two instructions don't actually do anything:
-        flags = [0]*self.n_flags
-        freqregs = [0]*2
-        ampregs = [0]*2
-        phaseregs = [0]*2
-        dds_enables = [0]*2
-        phase_resets = [0]*2
-        
-        pb_inst.append({'freqs': freqregs, 'amps': ampregs, 'phases': phaseregs, 'enables':dds_enables, 'phase_resets': phase_resets,
-                        'flags': ''.join([str(flag) for flag in flags]), 'instruction': 'STOP',
-                        'data': 0, 'delay': 10.0/self.clock_limit*1e9})
-        pb_inst.append({'freqs': freqregs, 'amps': ampregs, 'phases': phaseregs, 'enables':dds_enables, 'phase_resets': phase_resets,
-                        'flags': ''.join([str(flag) for flag in flags]), 'instruction': 'STOP',
-                        'data': 0, 'delay': 10.0/self.clock_limit*1e9})    
-        j += 2
-        
-        flagstring = '0'*self.n_flags # So that this variable is still defined if the for loop has no iterations
-        for k, instruction in enumerate(self.pseudoclock.clock):
+        """Build the pulse program for self.pseudoclock.clock as a structured array
+        with dtype self.pb_dtype, ready to be written to the shot file as the
+        PULSE_PROGRAM table. The flags, registers and LOOP/LONG_DELAY/END_LOOP
+        expansion of every pseudoclock instruction are computed at once with array
+        operations. freqs, amps and phases are the per-sample register numbers
+        returned by generate_registers()."""
+        clock = self.pseudoclock.clock
+        n_clock = len(clock)
+
+        # Bitmask of the flag ticked by each (non-internal) clock line:
+        clock_line_masks = {}
+        for clock_line in self.pseudoclock.child_devices:
+            if clock_line != self._direct_output_clock_line:
+                clock_line_masks[clock_line] = 1 << self.get_flag_number(clock_line.connection)
+
+        # Pull out the parts of each pseudoclock instruction that we need:
+        is_wait = np.zeros(n_clock, dtype=bool)
+        ticks_internal = np.zeros(n_clock, dtype=bool)
+        clock_flags = np.zeros(n_clock, dtype=np.int32)
+        reps = np.zeros(n_clock, dtype=np.int64)
+        step = np.zeros(n_clock, dtype=np.float64)
+        for k, instruction in enumerate(clock):
             if instruction == 'WAIT':
-                # This is a wait instruction. Repeat the last instruction but with a 100ns delay and a WAIT op code:
-                wait_instruction = pb_inst[-1].copy()
-                wait_instruction['delay'] = 100
-                wait_instruction['instruction'] = 'WAIT'
-                wait_instruction['data'] = 0
-                pb_inst.append(wait_instruction)
-                j += 1
+                is_wait[k] = True
                 continue
-                
-            flags = [0]*self.n_flags
-            # The registers below are ones, not zeros, so that we don't
-            # use the BLACS-inserted initial instructions. Instead
-            # unused DDSs have a 'zero' in register one for freq, amp
-            # and phase.
-            freqregs = [1]*2
-            ampregs = [1]*2
-            phaseregs = [1]*2
-            dds_enables = [0]*2
-            phase_resets = [0]*2
-            
-            # This flag indicates whether we need a full clock tick, or are just updating an internal output
-            only_internal = True
-            # find out which clock flags are ticking during this instruction
+            reps[k] = instruction['reps']
+            step[k] = instruction['step']
             for clock_line in instruction['enabled_clocks']:
-                if clock_line == self._direct_output_clock_line: 
-                    # advance i (the index keeping track of internal clockline output)
-                    i += 1
+                if clock_line == self._direct_output_clock_line:
+                    ticks_internal[k] = True
                 else:
-                    flag_index = int(clock_line.connection.split()[1])
-                    flags[flag_index] = 1
-                    # We are not just using the internal clock line
-                    only_internal = False
-            
-            for output in dig_outputs:
-                flagindex = int(output.connection.split()[1])
-                flags[flagindex] = int(output.raw_output[i])
-            for output in dds_outputs:
-                ddsnumber = int(output.connection.split()[1])
-                freqregs[ddsnumber] = freqs[ddsnumber][output.frequency.raw_output[i]]
-                ampregs[ddsnumber] = amps[ddsnumber][output.amplitude.raw_output[i]]
-                phaseregs[ddsnumber] = phases[ddsnumber][output.phase.raw_output[i]]
-                dds_enables[ddsnumber] = output.gate.raw_output[i]
-                if isinstance(output, PulseBlasterDDS):
-                    phase_resets[ddsnumber] = output.phase_reset.raw_output[i]
-                
-            flagstring = ''.join([str(flag) for flag in flags])
-            
-            if instruction['reps'] > 1048576:
-                raise LabscriptError('Pulseblaster cannot support more than 1048576 loop iterations. ' +
-                                      str(instruction['reps']) +' were requested at t = ' + str(instruction['start']) + '. '+
-                                     'This can be fixed easily enough by using nested loops. If it is needed, ' +
-                                     'please file a feature request at' +
-                                     'http://redmine.physics.monash.edu.au/projects/labscript.')
-                
-            if not only_internal:
-                if self.pulse_width == 'symmetric':
-                    high_time = instruction['step']/2
-                else:
-                    high_time = self.pulse_width
-                # High time cannot be longer than self.long_delay (~57 seconds for a
-                # 75MHz core clock freq). If it is, clip it to self.long_delay. In this
-                # case we are not honouring the requested symmetric or fixed pulse
-                # width. To do so would be possible, but would consume more pulseblaster
-                # instructions, so we err on the side of fewer instructions:
-                high_time = min(high_time, self.long_delay)
-
-                # Low time is whatever is left:
-                low_time = instruction['step'] - high_time
-
-                # Do we need to insert a LONG_DELAY instruction to create a delay this
-                # long?
-                n_long_delays, remaining_low_time =  divmod(low_time, self.long_delay)
-
-                # If the remainder is too short to be output, add self.long_delay to it.
-                # self.long_delay was constructed such that adding self.min_delay to it
-                # is still not too long for a single instruction:
-                if n_long_delays and remaining_low_time < self.min_delay:
-                    n_long_delays -= 1
-                    remaining_low_time += self.long_delay
-
-                # The start loop instruction, Clock edges are high:
-                pb_inst.append({'freqs': freqregs, 'amps': ampregs, 'phases': phaseregs, 'enables':dds_enables, 'phase_resets':phase_resets,
-                                'flags': flagstring, 'instruction': 'LOOP',
-                                'data': instruction['reps'], 'delay': high_time*1e9})
-                
-                for clock_line in instruction['enabled_clocks']:
-                    if clock_line != self._direct_output_clock_line:
-                        flag_index = int(clock_line.connection.split()[1])
-                        flags[flag_index] = 0
-                        
-                flagstring = ''.join([str(flag) for flag in flags])
-            
-                # The long delay instruction, if any. Clock edges are low: 
-                if n_long_delays:
-                    pb_inst.append({'freqs': freqregs, 'amps': ampregs, 'phases': phaseregs, 'enables':dds_enables, 'phase_resets':phase_resets,
-                                'flags': flagstring, 'instruction': 'LONG_DELAY',
-                                'data': int(n_long_delays), 'delay': self.long_delay*1e9})
-                                
-                # Remaining low time. Clock edges are low:
-                pb_inst.append({'freqs': freqregs, 'amps': ampregs, 'phases': phaseregs, 'enables':dds_enables, 'phase_resets':phase_resets,
-                                'flags': flagstring, 'instruction': 'END_LOOP',
-                                'data': j, 'delay': remaining_low_time*1e9})
-                                
-                # Two instructions were used in the case of there being no LONG_DELAY, 
-                # otherwise three. This increment is done here so that the j referred
-                # to in the previous line still refers to the LOOP instruction.
-                j += 3 if n_long_delays else 2
-            else:
-                # We only need to update a direct output, so no need to tick the clocks.
-
-                # Do we need to insert a LONG_DELAY instruction to create a delay this
-                # long?
-                n_long_delays, remaining_delay =  divmod(instruction['step'], self.long_delay)
-                # If the remainder is too short to be output, add self.long_delay to it.
-                # self.long_delay was constructed such that adding self.min_delay to it
-                # is still not too long for a single instruction:
-                if n_long_delays and remaining_delay < self.min_delay:
-                    n_long_delays -= 1
-                    remaining_delay += self.long_delay
-                
-                if n_long_delays:
-                    pb_inst.append({'freqs': freqregs, 'amps': ampregs, 'phases': phaseregs, 'enables':dds_enables, 'phase_resets':phase_resets,
-                                'flags': flagstring, 'instruction': 'LONG_DELAY',
-                                'data': int(n_long_delays), 'delay': self.long_delay*1e9})
-
-                pb_inst.append({'freqs': freqregs, 'amps': ampregs, 'phases': phaseregs, 'enables':dds_enables, 'phase_resets':phase_resets,
-                                'flags': flagstring, 'instruction': 'CONTINUE',
-                                'data': 0, 'delay': remaining_delay*1e9})
-                
-                j += 2 if n_long_delays else 1
-                
+                    clock_flags[k] |= clock_line_masks[clock_line]
+
+        # index into output.raw_output of where the pulseblaster flags are coming from
+        # for each instruction. The internal flag should always tick on the first
+        # instruction, so the index is never used whilst still -1:
+        i = np.cumsum(ticks_internal) - 1
+
+        # The state of the outputs during each instruction, excluding the clock flags.
+        # The registers below are ones, not zeros, so that we don't use the
+        # BLACS-inserted initial instructions. Instead unused DDSs have a 'zero' in
+        # register one for freq, amp and phase.
+        state = np.zeros(n_clock, dtype=self.pb_dtype)
+        for ddsnumber in range(2):
+            state['freq%d' % ddsnumber] = 1
+            state['amp%d' % ddsnumber] = 1
+            state['phase%d' % ddsnumber] = 1
+        for output in dig_outputs:
+            flagindex = int(output.connection.split()[1])
+            state['flags'] |= output.raw_output[i].astype(np.int32) << flagindex
+        for output in dds_outputs:
+            ddsnumber = int(output.connection.split()[1])
+            state['freq%d' % ddsnumber] = freqs[ddsnumber][i]
+            state['amp%d' % ddsnumber] = amps[ddsnumber][i]
+            state['phase%d' % ddsnumber] = phases[ddsnumber][i]
+            state['dds_en%d' % ddsnumber] = output.gate.raw_output[i]
+            if isinstance(output, PulseBlasterDDS):
+                state['phase_reset%d' % ddsnumber] = output.phase_reset.raw_output[i]
+
+        # A WAIT repeats the output state of the instruction before it, which is the
+        # BLACS-inserted dummy instruction (all zeros) if it comes before any others:
+        state[is_wait & (np.cumsum(~is_wait) == 0)] = 0
+
+        # Instructions that tick a clock flag are a LOOP with clock edges high,
+        # followed by an END_LOOP with clock edges low. Instructions only updating
+        # direct outputs are a single CONTINUE:
+        is_loop = ~is_wait & (clock_flags != 0)
+
+        # Loops with more repetitions than a single LOOP instruction supports are
+        # output as an outer loop, each iteration of which is a fixed number of clock
+        # ticks (including an inner loop), followed by a loop of the remaining ticks.
+        # A remainder of one more than a single loop supports is output as a full
+        # loop followed by a loop of one tick:
+        is_nested = is_loop & (reps > self.max_loop_reps)
+        ticks_per_outer_loop = self.max_loop_reps + 2
+        n_outer_loops, n_remaining_reps = np.divmod(reps, ticks_per_outer_loop)
+        n_extra_reps = (n_remaining_reps > self.max_loop_reps).astype(int)
+        n_remaining_reps -= n_extra_reps
+        too_many_reps = np.flatnonzero(is_nested & (n_outer_loops > self.max_loop_reps))
+        if len(too_many_reps):
+            instruction = clock[too_many_reps[0]]
+            max_reps = self.max_loop_reps * ticks_per_outer_loop + ticks_per_outer_loop - 1
+            raise LabscriptError('Pulseblaster cannot support more than %d loop iterations. '%max_reps +
+                                  str(instruction['reps']) +' were requested at t = ' + str(instruction['start']) + '.')
+        if self.pulse_width == 'symmetric':
+            high_time = step / 2
+        else:
+            high_time = np.full(n_clock, self.pulse_width, dtype=np.float64)
+        # High time cannot be longer than self.long_delay (~57 seconds for a
+        # 75MHz core clock freq). If it is, clip it to self.long_delay. In this
+        # case we are not honouring the requested symmetric or fixed pulse
+        # width. To do so would be possible, but would consume more pulseblaster
+        # instructions, so we err on the side of fewer instructions:
+        high_time = np.minimum(high_time, self.long_delay)
+        # Low time is whatever is left:
+        low_time = np.where(is_loop, step - high_time, step)
+
+        # Do we need to insert a LONG_DELAY instruction to create a delay this long?
+        n_long_delays, remaining_low_time = np.divmod(low_time, self.long_delay)
+        # If the remainder is too short to be output, add self.long_delay to it.
+        # self.long_delay was constructed such that adding self.min_delay to it
+        # is still not too long for a single instruction:
+        too_short = (n_long_delays != 0) & (remaining_low_time < self.min_delay)
+        n_long_delays[too_short] -= 1
+        remaining_low_time[too_short] += self.long_delay
+        has_long_delay = ~is_wait & (n_long_delays != 0)
 
+        # From here on, is_loop refers only to loops that are not nested:
+        is_loop &= ~is_nested
+
+        # Number of hardware instructions each pseudoclock instruction becomes, and
+        # the line number of the first of them. We've delegated the initial two
+        # instructions off to BLACS, which can ensure continuity with the state of the
+        # front panel, so the pulse program proper starts at line two:
+        n_lines = 1 + is_loop.astype(int) + has_long_delay
+        # A nested loop is an outer LOOP, a tick, an inner LOOP and END_LOOP, a tick and
+        # the outer END_LOOP, each with a LONG_DELAY for its low time if needed, if
+        # there are any outer loops. These are followed by a LOOP and END_LOOP for the
+        # remaining ticks, if any, and another for the extra tick, if any:
+        n_loops = 3*(n_outer_loops != 0) + (n_remaining_reps != 0) + n_extra_reps
+        n_lines[is_nested] = (n_loops*(2 + has_long_delay))[is_nested]
+        first_line = 2 + np.cumsum(n_lines) - n_lines
+        last_line = first_line + n_lines - 1
+
+        pb_inst = np.zeros(2 + n_lines.sum() + 1, dtype=self.pb_dtype)
+        pb_inst[2:-1] = state[np.repeat(np.arange(n_clock), n_lines)]
+
+        # The two dummy instructions for BLACS at the start:
+        pb_inst['inst'][:2] = self.pb_instructions['STOP']
+        pb_inst['length'][:2] = 10.0/self.clock_limit*1e9
+
+        # The start loop instructions, Clock edges are high:
+        loop_lines = first_line[is_loop]
+        pb_inst['flags'][loop_lines] |= clock_flags[is_loop]
+        pb_inst['inst'][loop_lines] = self.pb_instructions['LOOP']
+        pb_inst['inst_data'][loop_lines] = reps[is_loop]
+        pb_inst['length'][loop_lines] = high_time[is_loop]*1e9
+
+        # The long delay instructions, if any. Clock edges are low:
+        has_long_delay &= ~is_nested
+        long_delay_lines = first_line[has_long_delay] + is_loop[has_long_delay]
+        pb_inst['inst'][long_delay_lines] = self.pb_instructions['LONG_DELAY']
+        pb_inst['inst_data'][long_delay_lines] = n_long_delays[has_long_delay]
+        pb_inst['length'][long_delay_lines] = self.long_delay*1e9
+
+        # The end loop or continue instructions for the remaining low time, and the
+        # waits. END_LOOP instructions refer back to the line of their LOOP:
+        pb_inst['inst'][last_line] = np.where(
+            is_wait,
+            self.pb_instructions['WAIT'],
+            np.where(is_loop, self.pb_instructions['END_LOOP'], self.pb_instructions['CONTINUE'])
+        )
+        pb_inst['inst_data'][last_line] = np.where(is_loop, first_line, 0)
+        pb_inst['length'][last_line] = np.where(is_wait, 100, remaining_low_time*1e9)
+
+        # Nested loops, overwriting the last instruction filled in for them above:
+        for k in np.flatnonzero(is_nested):
+            self._write_nested_loop(
+                pb_inst,
+                first_line[k],
+                clock_flags[k],
+                n_outer_loops[k],
+                n_remaining_reps[k],
+                n_extra_reps[k],
+                high_time[k],
+                remaining_low_time[k],
+                n_long_delays[k],
+            )
+
+        # The final instruction keeps the output state of the one before it:
+        pb_inst[-1] = pb_inst[-2]
+        if n_clock == 0:
+            pb_inst[-1] = 0
+        pb_inst['inst_data'][-1] = 0
+        pb_inst['length'][-1] = 10.0/self.clock_limit*1e9
         if self.programming_scheme == 'pb_start/BRANCH':
             # This is how we stop the pulse program. We branch from the last
             # instruction to the zeroth, which BLACS has programmed in with
             # the same values and a WAIT instruction. The PulseBlaster then
             # waits on instuction zero, which is a state ready for either
             # further static updates or buffered mode.
-            pb_inst.append({'freqs': freqregs, 'amps': ampregs, 'phases': phaseregs, 'enables':dds_enables, 'phase_resets':phase_resets,
-                            'flags': flagstring, 'instruction': 'BRANCH',
-                            'data': 0, 'delay': 10.0/self.clock_limit*1e9})
+            pb_inst['inst'][-1] = self.pb_instructions['BRANCH']
         elif self.programming_scheme == 'pb_stop_programming/STOP':
             # An ordinary stop instruction. This has the downside that the PulseBlaster might
             # (on some models) reset its output to zero momentarily until BLACS calls program_manual, which
@@ -574,51 +688,195 @@ class PulseBlaster(PseudoclockDevice):
             # repeated triggers coming to it, such as a 50Hz/60Hz line trigger. We can't have it sit
             # on a WAIT instruction as above, or it will trigger and run repeatedly when that's not what
             # we wanted.
-            pb_inst.append({'freqs': freqregs, 'amps': ampregs, 'phases': phaseregs, 'enables':dds_enables, 'phase_resets':phase_resets,
-                            'flags': flagstring, 'instruction': 'STOP',
-                            'data': 0, 'delay': 10.0/self.clock_limit*1e9})
+            pb_inst['inst'][-1] = self.pb_instructions['STOP']
         else:
             raise AssertionError('Invalid programming scheme %s'%str(self.programming_scheme))
+
+        if self.optimise_pulse_program:
+            pb_inst = self.optimise_pb_inst(pb_inst)
             
         if len(pb_inst) > self.max_instructions:
             raise LabscriptError("The Pulseblaster memory cannot store more than {:d} instuctions, but the PulseProgram contains {:d} instructions.".format(self.max_instructions, len(pb_inst))) 
             
         return pb_inst
+
+    def _write_nested_loop(self, pb_inst, line, clock_flags, n_outer_loops, n_remaining_reps,
+                           n_extra_reps, high_time, low_time, n_long_delays):
+        """Fill in the instructions of pb_inst, starting at line, for a loop of
+        clock ticks too long for a single LOOP instruction. Each iteration of the
+        outer loop is self.max_loop_reps + 2 ticks: one tick, an inner loop of
+        self.max_loop_reps ticks, and a final tick whose low time is the outer
+        END_LOOP. The remaining ticks follow as an ordinary loop, and the extra
+        ticks, if any, as another. The output state other than the clock flags is
+        assumed already present in pb_inst."""
+        rows = []
+        def tick(first_inst, first_data, last_inst, last_data):
+            # Clock edges are high in the first instruction and low in the rest:
+            rows.append((first_inst, first_data, high_time, True))
+            if n_long_delays:
+                rows.append(('LONG_DELAY', int(n_long_delays), self.long_delay, False))
+            rows.append((last_inst, last_data, low_time, False))
+
+        if n_outer_loops:
+            outer_loop_line = line
+            tick('LOOP', n_outer_loops, 'CONTINUE', 0)
+            inner_loop_line = line + len(rows)
+            tick('LOOP', self.max_loop_reps, 'END_LOOP', inner_loop_line)
+            tick('CONTINUE', 0, 'END_LOOP', outer_loop_line)
+        for n_reps in [n_remaining_reps, n_extra_reps]:
+            if n_reps:
+                loop_line = line + len(rows)
+                tick('LOOP', n_reps, 'END_LOOP', loop_line)
+
+        loop_counts = [data for instruction, data, _, _ in rows if instruction == 'LOOP']
+        assert all(1 <= n <= self.max_loop_reps for n in loop_counts), loop_counts
+
+        for offset, (instruction, data, delay, clock_high) in enumerate(rows):
+            pb_inst['inst'][line + offset] = self.pb_instructions[instruction]
+            pb_inst['inst_data'][line + offset] = data
+            pb_inst['length'][line + offset] = delay*1e9
+            if clock_high:
+                pb_inst['flags'][line + offset] |= clock_flags
+
+    @profile
+    def optimise_pb_inst(self, pb_inst):
+        """Peephole optimisation of the pulse program pb_inst, as returned by
+        convert_to_pb_inst(). Consecutive identical loops are folded into one loop
+        with the total number of repetitions, and runs of adjacent CONTINUE
+        instructions with the same output state are merged into one. The output of
+        the PulseBlaster is unchanged, to the core clock cycle. The number of
+        instructions saved is saved as the device property
+        'optimisation_instructions_saved'. Returns the optimised pulse program."""
+        n_instructions = len(pb_inst)
+        pb_inst = self._fold_loops(pb_inst)
+        pb_inst = self._merge_continues(pb_inst)
+        self.set_property('optimisation_instructions_saved', n_instructions - len(pb_inst),
+                          location='device_properties')
+        return pb_inst
+
+    def _state_equal(self, pb_inst, a, b, fields=None):
+        """Return a boolean array of whether the instructions at indices a and b of
+        pb_inst have equal values of the given fields. Defaults to the fields
+        describing the output state, i.e. all but the op code, data and length."""
+        if fields is None:
+            fields = [name for name in pb_inst.dtype.names if name not in ('inst', 'inst_data', 'length')]
+        equal = np.ones(len(a), dtype=bool)
+        for name in fields:
+            equal &= pb_inst[name][a] == pb_inst[name][b]
+        return equal
+
+    def _delete_instructions(self, pb_inst, delete):
+        """Remove the instructions where the boolean array delete is True, updating
+        the line numbers that END_LOOP instructions refer back to. The deleted
+        instructions must not be the target of any END_LOOP."""
+        new_line = np.cumsum(~delete) - 1
+        pb_inst = pb_inst[~delete]
+        end_loops = pb_inst['inst'] == self.pb_instructions['END_LOOP']
+        pb_inst['inst_data'][end_loops] = new_line[pb_inst['inst_data'][end_loops]]
+        return pb_inst
+
+    def _fold_loops(self, pb_inst):
+        """Fold consecutive identical loops (a LOOP, an optional LONG_DELAY and an
+        END_LOOP referring back to the LOOP) into a single loop, as long as the total
+        number of repetitions does not exceed the hardware maximum."""
+        inst = pb_inst['inst']
+        data = pb_inst['inst_data']
+        n = len(pb_inst)
+        loop_lines = np.flatnonzero(inst == self.pb_instructions['LOOP'])
+        # The number of instructions in each loop, or zero if it is not a simple loop:
+        loop_sizes = np.zeros(len(loop_lines), dtype=int)
+        for size in [2, 3]:
+            end_lines = np.minimum(loop_lines + size - 1, n - 1)
+            simple = (
+                (inst[end_lines] == self.pb_instructions['END_LOOP'])
+                & (data[end_lines] == loop_lines)
+                & (loop_lines + size - 1 < n)
+            )
+            if size == 3:
+                simple &= inst[np.minimum(loop_lines + 1, n - 1)] == self.pb_instructions['LONG_DELAY']
+            loop_sizes[simple] = size
+
+        # Whether each loop is identical, apart from its number of repetitions, to the
+        # loop immediately following it:
+        same_as_next = (
+            (loop_sizes[:-1] != 0)
+            & (loop_sizes[:-1] == loop_sizes[1:])
+            & (loop_lines[:-1] + loop_sizes[:-1] == loop_lines[1:])
+        )
+        for offset in range(3):
+            rows = np.flatnonzero(same_as_next & (offset < loop_sizes[:-1]))
+            a = loop_lines[rows] + offset
+            b = loop_lines[rows + 1] + offset
+            fields = [name for name in pb_inst.dtype.names if name != 'inst_data']
+            equal = self._state_equal(pb_inst, a, b, fields)
+            if offset == 1:
+                # The repetitions of a LONG_DELAY must also match:
+                equal &= (inst[a] != self.pb_instructions['LONG_DELAY']) | (data[a] == data[b])
+            same_as_next[rows] &= equal
+
+        if not same_as_next.any():
+            return pb_inst
+
+        pb_inst = pb_inst.copy()
+        delete = np.zeros(n, dtype=bool)
+        first = 0
+        for k in np.flatnonzero(same_as_next):
+            if not delete[loop_lines[k]]:
+                # Loop k is not itself being folded into an earlier one:
+                first = k
+            total_reps = pb_inst['inst_data'][loop_lines[first]] + pb_inst['inst_data'][loop_lines[k + 1]]
+            if total_reps > self.max_loop_reps:
+                continue
+            pb_inst['inst_data'][loop_lines[first]] = total_reps
+            delete[loop_lines[k + 1]:loop_lines[k + 1] + loop_sizes[k + 1]] = True
+        return self._delete_instructions(pb_inst, delete)
+
+    def _merge_continues(self, pb_inst):
+        """Merge runs of adjacent CONTINUE instructions with the same output state
+        into a single CONTINUE, as long as the total is not too long for a single
+        instruction. Only instructions whose durations are whole numbers of core clock
+        cycles are merged, so that neither the durations stored in the pulse program
+        nor what the PulseBlaster outputs, which rounds each duration to whole cycles,
+        are changed."""
+        n = len(pb_inst)
+        cycles_per_ns = self.core_clock_freq / 1e3
+        cycles = pb_inst['length'] * cycles_per_ns
+        whole_cycles = np.abs(cycles - np.round(cycles)) < 1e-6
+        mergeable = (pb_inst['inst'] == self.pb_instructions['CONTINUE']) & whole_cycles
+        # The first two instructions are for BLACS and must stay where they are:
+        mergeable[:2] = False
+        merge = np.zeros(n, dtype=bool)
+        merge[1:] = (
+            mergeable[1:]
+            & mergeable[:-1]
+            & self._state_equal(pb_inst, np.arange(n - 1), np.arange(1, n))
+        )
+        if not merge.any():
+            return pb_inst
+
+        run_starts = np.flatnonzero(~merge)
+        run_lengths = np.diff(np.append(run_starts, n))
+        run_durations = np.add.reduceat(pb_inst['length'], run_starts)
+        # Runs too long for a single instruction are left alone:
+        fits = run_durations <= self.long_delay * 1e9
+        merge &= np.repeat(fits, run_lengths)
+        merged = fits & (run_lengths > 1)
+
+        optimised = pb_inst.copy()
+        optimised['length'][run_starts[merged]] = run_durations[merged]
+        optimised = self._delete_instructions(optimised, merge)
+        # The time at which each remaining instruction ends must be unchanged:
+        end_times = np.cumsum(pb_inst['length'])[~np.append(merge[1:], False)]
+        assert np.allclose(np.cumsum(optimised['length']), end_times, rtol=0, atol=1e-3)
+        return optimised
         
+    @profile
     def write_pb_inst_to_h5(self, pb_inst, hdf5_file):
-        # OK now we squeeze the instructions into a numpy array ready for writing to hdf5:
-        pb_dtype = [('freq0', np.int32), ('phase0', np.int32), ('amp0', np.int32), 
-                    ('dds_en0', np.int32), ('phase_reset0', np.int32),
-                    ('freq1', np.int32), ('phase1', np.int32), ('amp1', np.int32),
-                    ('dds_en1', np.int32), ('phase_reset1', np.int32),
-                    ('flags', np.int32), ('inst', np.int32),
-                    ('inst_data', np.int32), ('length', np.float64)]
-        pb_inst_table = np.empty(len(pb_inst),dtype = pb_dtype)
-        for i,inst in enumerate(pb_inst):
-            flagint = int(inst['flags'][::-1],2)
-            instructionint = self.pb_instructions[inst['instruction']]
-            dataint = inst['data']
-            delaydouble = inst['delay']
-            freq0 = inst['freqs'][0]
-            freq1 = inst['freqs'][1]
-            phase0 = inst['phases'][0]
-            phase1 = inst['phases'][1]
-            amp0 = inst['amps'][0]
-            amp1 = inst['amps'][1]
-            en0 = inst['enables'][0]
-            en1 = inst['enables'][1]
-            phase_reset0 = inst['phase_resets'][0]
-            phase_reset1 = inst['phase_resets'][1]
-            
-            pb_inst_table[i] = (freq0,phase0,amp0,en0,phase_reset0,freq1,phase1,amp1,en1,phase_reset1, flagint, 
-                                instructionint, dataint, delaydouble)     
-                                
-        # Okay now write it to the file: 
+        # pb_inst is already a numpy array ready for writing to hdf5:
         group = hdf5_file['/devices/'+self.name]  
-        group.create_dataset('PULSE_PROGRAM', compression=config.compression,data = pb_inst_table)   
+        group.create_dataset('PULSE_PROGRAM', compression=config.compression,data = pb_inst)   
         self.set_property('stop_time', self.stop_time, location='device_properties')
 
-
     def _check_wait_monitor_ok(self):
         if (
             compiler.master_pseudoclock is self
@@ -636,13 +894,14 @@ class PulseBlaster(PseudoclockDevice):
 
     def generate_code(self, hdf5_file):
         # Generate the hardware instructions
-        hdf5_file.create_group('/devices/' + self.name)
-        PseudoclockDevice.generate_code(self, hdf5_file)
-        dig_outputs, dds_outputs = self.get_direct_outputs()
-        freqs, amps, phases = self.generate_registers(hdf5_file, dds_outputs)
-        pb_inst = self.convert_to_pb_inst(dig_outputs, dds_outputs, freqs, amps, phases)
-        self._check_wait_monitor_ok()
-        self.write_pb_inst_to_h5(pb_inst, hdf5_file)
+        group = hdf5_file.create_group('/devices/' + self.name)
+        with profile_shot(group):
+            PseudoclockDevice.generate_code(self, hdf5_file)
+            dig_outputs, dds_outputs = self.get_direct_outputs()
+            freqs, amps, phases = self.generate_registers(hdf5_file, dds_outputs)
+            pb_inst = self.convert_to_pb_inst(dig_outputs, dds_outputs, freqs, amps, phases)
+            self._check_wait_monitor_ok()
+            self.write_pb_inst_to_h5(pb_inst, hdf5_file)
         
 
 
@@ -665,526 +924,133 @@ class PulseBlasterDirectOutputs(IntermediateDevice):
                                      'The digital gate is always internal to the Pulseblaster.')
 
 
-from blacs.tab_base_classes import Worker, define_state
-from blacs.tab_base_classes import MODE_MANUAL, MODE_TRANSITION_TO_BUFFERED, MODE_TRANSITION_TO_MANUAL, MODE_BUFFERED  
-
-from blacs.device_base_class import DeviceTab
+class PulseProgramBanks(object):
+    """Keeps track of several pulse programs held in the PulseBlaster's instruction
+    memory at once, for the worker's bank mode. Programs are keyed by their contents
+    and placed in the first gap large enough to hold them, evicting the least
+    recently used as necessary. Lines here are counted from line two of the
+    PulseBlaster's memory, since lines zero and one are written by the worker
+    itself."""
+    def __init__(self, n_banks, n_lines):
+        self.n_banks = n_banks
+        self.n_lines = n_lines
+        # (offset, length) of each resident program, least recently used first:
+        self.banks = OrderedDict()
+        self.memory = None
 
-from qtutils import UiLoader
-import qtutils.icons
-import os
+    def _find_space(self, length):
+        start = 0
+        for offset, n in sorted(self.banks.values()):
+            if offset - start >= length:
+                return start
+            start = offset + n
+        if self.n_lines - start >= length:
+            return start
+        return None
 
-# We can't import * from QtCore & QtGui, as one of them has a function called bin() which overrides the builtin, which is used in the pulseblaster worker
-from qtutils.qt import QtCore
-from qtutils.qt import QtGui
+    def load(self, pulse_program):
+        """Make pulse_program resident. Returns the line of the PulseBlaster's memory
+        at which it begins, and an array of the instructions that should be in memory
+        from line two onward."""
+        key = pulse_program.tobytes()
+        if key in self.banks:
+            self.banks[key] = self.banks.pop(key)
+            offset, _ = self.banks[key]
+            return offset + 2, self.memory
+        while len(self.banks) >= self.n_banks or self._find_space(len(pulse_program)) is None:
+            self.banks.popitem(last=False)
+        offset = self._find_space(len(pulse_program))
+        self.banks[key] = (offset, len(pulse_program))
+        # Anything not overwritten by this program is left as it was, so that it is
+        # not reprogrammed unnecessarily:
+        end = max(offset + n for offset, n in self.banks.values())
+        memory = np.zeros(end, dtype=pulse_program.dtype)
+        if self.memory is not None:
+            n_kept = min(len(self.memory), end)
+            memory[:n_kept] = self.memory[:n_kept]
+        # END_LOOP instructions refer to lines of the PulseBlaster's memory, and were
+        # compiled for a program starting at line two:
+        program = pulse_program.copy()
+        is_end_loop = program['inst'] == PulseBlaster.pb_instructions['END_LOOP']
+        program['inst_data'][is_end_loop] += offset
+        memory[offset:offset + len(program)] = program
+        self.memory = memory
+        return offset + 2, self.memory
 
-    
 
-@BLACS_tab
-class PulseBlasterTab(DeviceTab):
-    
-    def initialise_GUI(self):
-        # Capabilities
-        self.base_units     = {'freq':'Hz',        'amp':'Vpp', 'phase':'Degrees'}
-        self.base_min       = {'freq':0.3,         'amp':0.0,   'phase':0}
-        self.base_max       = {'freq':150000000.0, 'amp':1.0,   'phase':360}
-        self.base_step      = {'freq':1000000,     'amp':0.01,  'phase':1}
-        self.base_decimals  = {'freq':1,           'amp':3,     'phase':3}
-        self.num_DDS = 2
-        self.num_DO = 12
-        
-        dds_prop = {}
-        for i in range(self.num_DDS): # 2 is the number of DDS outputs on this device
-            dds_prop['dds %d'%i] = {}
-            for subchnl in ['freq', 'amp', 'phase']:
-                dds_prop['dds %d'%i][subchnl] = {'base_unit':self.base_units[subchnl],
-                                                 'min':self.base_min[subchnl],
-                                                 'max':self.base_max[subchnl],
-                                                 'step':self.base_step[subchnl],
-                                                 'decimals':self.base_decimals[subchnl]
-                                                }
-            dds_prop['dds %d'%i]['gate'] = {}
-        
-        do_prop = {}
-        for i in range(self.num_DO): # 12 is the maximum number of flags on this device (some only have 4 though)
-            do_prop['flag %d'%i] = {}
-        
-        # Create the output objects    
-        self.create_dds_outputs(dds_prop)        
-        self.create_digital_outputs(do_prop)        
-        # Create widgets for output objects
-        dds_widgets,ao_widgets,do_widgets = self.auto_create_widgets()
-        
-        # Define the sort function for the digital outputs
-        def sort(channel):
-            flag = channel.replace('flag ','')
-            flag = int(flag)
-            return '%02d'%(flag)
-        
-        # and auto place the widgets in the UI
-        self.auto_place_widgets(("DDS Outputs",dds_widgets),("Flags",do_widgets,sort))
-        
-        # Store the board number to be used
-        connection_object = self.settings['connection_table'].find_by_name(self.device_name)
-        self.board_number = int(connection_object.BLACS_connection)
-        
-        # And which scheme we're using for buffered output programming and triggering:
-        # (default values for backward compat with old connection tables)
-        self.programming_scheme = connection_object.properties.get('programming_scheme', 'pb_start/BRANCH')
-            
-        # Create and set the primary worker
-        self.create_worker("main_worker",PulseblasterWorker,{'board_number':self.board_number,
-                                                             'programming_scheme': self.programming_scheme})
-        self.primary_worker = "main_worker"
-        
-        # Set the capabilities of this device
-        self.supports_smart_programming(True) 
-        
-        # Load status monitor (and start/stop/reset buttons) UI
-        ui = UiLoader().load(os.path.join(os.path.dirname(os.path.realpath(__file__)),'pulseblaster.ui'))        
-        self.get_tab_layout().addWidget(ui)
-        # Connect signals for buttons
-        ui.start_button.clicked.connect(self.start)
-        ui.stop_button.clicked.connect(self.stop)
-        ui.reset_button.clicked.connect(self.reset)
-        # Add icons
-        ui.start_button.setIcon(QtGui.QIcon(':/qtutils/fugue/control'))
-        ui.start_button.setToolTip('Start')
-        ui.stop_button.setIcon(QtGui.QIcon(':/qtutils/fugue/control-stop-square'))
-        ui.stop_button.setToolTip('Stop')
-        ui.reset_button.setIcon(QtGui.QIcon(':/qtutils/fugue/arrow-circle'))
-        ui.reset_button.setToolTip('Reset')
-        
-        # initialise dictionaries of data to display and get references to the QLabels
-        self.status_states = ['stopped', 'reset', 'running', 'waiting']
-        self.status = {}
-        self.status_widgets = {}
-        for state in self.status_states:
-            self.status[state] = False
-            self.status_widgets[state] = getattr(ui,'%s_label'%state)        
-        
-        # Create status monitor timout
-        self.statemachine_timeout_add(2000, self.status_monitor)
-        
-    def get_child_from_connection_table(self, parent_device_name, port):
-        # This is a direct output, let's search for it on the internal intermediate device called 
-        # PulseBlasterDirectOutputs
-        if parent_device_name == self.device_name:
-            device = self.connection_table.find_by_name(self.device_name)
-            pseudoclock = device.child_list[list(device.child_list.keys())[0]] # there should always be one (and only one) child, the Pseudoclock
-            clockline = None
-            for child_name, child in pseudoclock.child_list.items():
-                # store a reference to the internal clockline
-                if child.parent_port == 'internal':
-                    clockline = child
-                # if the port is in use by a clockline, return the clockline
-                elif child.parent_port == port:
-                    return child
-                
-            if clockline is not None:
-                # There should only be one child of this clock line, the direct outputs
-                direct_outputs = clockline.child_list[list(clockline.child_list.keys())[0]]
-                # look to see if the port is used by a child of the direct outputs
-                return DeviceTab.get_child_from_connection_table(self, direct_outputs.name, port)
-            else:
-                return ''
-        else:
-            # else it's a child of a DDS, so we can use the default behaviour to find the device
-            return DeviceTab.get_child_from_connection_table(self, parent_device_name, port)
-    
-    # This function gets the status of the Pulseblaster from the spinapi,
-    # and updates the front panel widgets!
-    @define_state(MODE_MANUAL|MODE_BUFFERED|MODE_TRANSITION_TO_BUFFERED|MODE_TRANSITION_TO_MANUAL,True)  
-    def status_monitor(self,notify_queue=None):
-        # When called with a queue, this function writes to the queue
-        # when the pulseblaster is waiting. This indicates the end of
-        # an experimental run.
-        self.status, waits_pending, time_based_shot_over = yield(self.queue_work(self._primary_worker,'check_status'))
-        
-        if self.programming_scheme == 'pb_start/BRANCH':
-            done_condition = self.status['waiting']
-        elif self.programming_scheme == 'pb_stop_programming/STOP':
-            done_condition = self.status['stopped']
-            
-        if time_based_shot_over is not None:
-            done_condition = time_based_shot_over
-            
-        if notify_queue is not None and done_condition and not waits_pending:
-            # Experiment is over. Tell the queue manager about it, then
-            # set the status checking timeout back to every 2 seconds
-            # with no queue.
-            notify_queue.put('done')
-            self.statemachine_timeout_remove(self.status_monitor)
-            self.statemachine_timeout_add(2000,self.status_monitor)
-            if self.programming_scheme == 'pb_stop_programming/STOP':
-                # Not clear that on all models the outputs will be correct after being
-                # stopped this way, so we do program_manual with current values to be sure:
-                self.program_device()
-                
-        # Update widgets with new status
-        for state in self.status_states:
-            if self.status[state]:
-                icon = QtGui.QIcon(':/qtutils/fugue/tick')
-            else:
-                icon = QtGui.QIcon(':/qtutils/fugue/cross')
-            
-            pixmap = icon.pixmap(QtCore.QSize(16, 16))
-            self.status_widgets[state].setPixmap(pixmap)
-                        
-    @define_state(MODE_MANUAL|MODE_BUFFERED|MODE_TRANSITION_TO_BUFFERED|MODE_TRANSITION_TO_MANUAL,True)  
-    def start(self,widget=None):
-        yield(self.queue_work(self._primary_worker,'start_run'))
-        self.status_monitor()
-        
-    @define_state(MODE_MANUAL|MODE_BUFFERED|MODE_TRANSITION_TO_BUFFERED|MODE_TRANSITION_TO_MANUAL,True)  
-    def stop(self,widget=None):
-        yield(self.queue_work(self._primary_worker,'pb_stop'))
-        self.status_monitor()
-        
-    @define_state(MODE_MANUAL|MODE_BUFFERED|MODE_TRANSITION_TO_BUFFERED|MODE_TRANSITION_TO_MANUAL,True)  
-    def reset(self,widget=None):
-        yield(self.queue_work(self._primary_worker,'pb_reset'))
-        self.status_monitor()
-    
-    @define_state(MODE_BUFFERED,True)  
-    def start_run(self, notify_queue):
-        """Starts the Pulseblaster, notifying the queue manager when
-        the run is over"""
-        self.statemachine_timeout_remove(self.status_monitor)
-        self.start()
-        self.statemachine_timeout_add(100,self.status_monitor,notify_queue)
-
-
-class PulseblasterWorker(Worker):
-    def init(self):
-        from labscript_utils import check_version
-        check_version('spinapi', '3.2.0', '4')
-        exec('from spinapi import *', globals())
-        global h5py; import labscript_utils.h5_lock, h5py
-        global zprocess; import zprocess
-        
-        self.pb_start = pb_start
-        self.pb_stop = pb_stop
-        self.pb_reset = pb_reset
-        self.pb_close = pb_close
-        self.pb_read_status = pb_read_status
-        self.smart_cache = {'amps0':None,'freqs0':None,'phases0':None,
-                            'amps1':None,'freqs1':None,'phases1':None,
-                            'pulse_program':None,'ready_to_go':False,
-                            'initial_values':None}
-                            
-        # An event for checking when all waits (if any) have completed, so that
-        # we can tell the difference between a wait and the end of an experiment.
-        # The wait monitor device is expected to post such events, which we'll wait on:
-        self.all_waits_finished = zprocess.Event('all_waits_finished')
-        self.waits_pending = False
-    
-        pb_select_board(self.board_number)
-        pb_init()
-        pb_core_clock(75)
-        
-        # This is only set to True on a per-shot basis, so set it to False
-        # for manual mode. Set associated attributes to None:
-        self.time_based_stop_workaround = False
-        self.time_based_shot_duration = None
-        self.time_based_shot_end_time = None
-
-    def program_manual(self,values):
-    
-        if self.programming_scheme == 'pb_stop_programming/STOP':
-            # Need to ensure device is stopped before programming - or we won't know what line it's on.
-            pb_stop()
-            
-        # Program the DDS registers:
-        for i in range(2):
-            pb_select_dds(i)
-            # Program the frequency, amplitude and phase into their
-            # zeroth registers:
-            program_amp_regs(values['dds %d'%i]['amp']) # Does not call pb_stop_programming anyway, so no kwarg needed
-            program_freq_regs(values['dds %d'%i]['freq']/10.0**6, call_stop_programming=False) # method expects MHz
-            program_phase_regs(values['dds %d'%i]['phase'], call_stop_programming=False)
-
-        # create flags string
-        # NOTE: The spinapi can take a string or integer for flags.
-                # If it is a string: 
-                #     flag: 0          12
-                #          '101100011111'
-                #
-                # If it is a binary number:
-                #     flag:12          0
-                #         0b111110001101
-                #
-                # Be warned!
-        flags = ''
-        for i in range(12):
-            if values['flag %d'%i]:
-                flags += '1'
-            else:
-                flags += '0'
-        
-        # Write the first two lines of the pulse program:
-        pb_start_programming(PULSE_PROGRAM)
-        # Line zero is a wait:
-        pb_inst_dds2(0,0,0,values['dds 0']['gate'],0,0,0,0,values['dds 1']['gate'],0,flags, WAIT, 0, 100)
-        # Line one is a brach to line 0:
-        pb_inst_dds2(0,0,0,values['dds 0']['gate'],0,0,0,0,values['dds 1']['gate'],0,flags, BRANCH, 0, 100)
-        pb_stop_programming()
-        
-        # Now we're waiting on line zero, so when we start() we'll go to
-        # line one, then brach back to zero, completing the static update:
-        pb_start()
-        
-        # The pulse program now has a branch in line one, and so can't proceed to the pulse program
-        # without a reprogramming of the first two lines:
-        self.smart_cache['ready_to_go'] = False
-        
-        # TODO: return coerced/quantised values
-        return {}
-        
-    def start_run(self):
-        if self.programming_scheme == 'pb_start/BRANCH':
-            pb_start()
-        elif self.programming_scheme == 'pb_stop_programming/STOP':
-            pb_stop_programming()
-            pb_start()
-        else:
-            raise ValueError('invalid programming_scheme: %s'%str(self.programming_scheme))
-        if self.time_based_stop_workaround:
-            import time
-            self.time_based_shot_end_time = time.time() + self.time_based_shot_duration
-    
-    def transition_to_buffered(self,device_name,h5file,initial_values,fresh):
-        self.h5file = h5file
-        if self.programming_scheme == 'pb_stop_programming/STOP':
-            # Need to ensure device is stopped before programming - or we wont know what line it's on.
-            pb_stop()
-        with h5py.File(h5file,'r') as hdf5_file:
-            group = hdf5_file['devices/%s'%device_name]
-            
-            # Is this shot using the fixed-duration workaround instead of checking the PulseBlaster's status?
-            self.time_based_stop_workaround = group.attrs.get('time_based_stop_workaround', False)
-            if self.time_based_stop_workaround:
-                self.time_based_shot_duration = (group.attrs['stop_time']
-                                                 + hdf5_file['waits'][:]['timeout'].sum()
-                                                 + group.attrs['time_based_stop_workaround_extra_time'])
-            
-            # Program the DDS registers:
-            ampregs = []
-            freqregs = []
-            phaseregs = []
-            for i in range(2):
-                amps = group['DDS%d/AMP_REGS'%i][:]
-                freqs = group['DDS%d/FREQ_REGS'%i][:]
-                phases = group['DDS%d/PHASE_REGS'%i][:]
-                
-                amps[0] = initial_values['dds %d'%i]['amp']
-                freqs[0] = initial_values['dds %d'%i]['freq']/10.0**6 # had better be in MHz!
-                phases[0] = initial_values['dds %d'%i]['phase']
-                
-                pb_select_dds(i)
-                # Only reprogram each thing if there's been a change:
-                if fresh or len(amps) != len(self.smart_cache['amps%d'%i]) or (amps != self.smart_cache['amps%d'%i]).any():   
-                    self.smart_cache['amps%d'%i] = amps
-                    program_amp_regs(*amps)
-                if fresh or len(freqs) != len(self.smart_cache['freqs%d'%i]) or (freqs != self.smart_cache['freqs%d'%i]).any():
-                    self.smart_cache['freqs%d'%i] = freqs
-                    # We must be careful not to call stop_programming() until the end,
-                    # lest the pulseblaster become responsive to triggers before we are done programming.
-                    # This is not an issue for program_amp_regs above, only for freq and phase regs.
-                    program_freq_regs(*freqs, call_stop_programming=False)
-                if fresh or len(phases) != len(self.smart_cache['phases%d'%i]) or (phases != self.smart_cache['phases%d'%i]).any():      
-                    self.smart_cache['phases%d'%i] = phases
-                    # See above comment - we must not call pb_stop_programming here:
-                    program_phase_regs(*phases, call_stop_programming=False)
-                
-                ampregs.append(amps)
-                freqregs.append(freqs)
-                phaseregs.append(phases)
-                
-            # Now for the pulse program:
-            pulse_program = group['PULSE_PROGRAM'][2:]
-            
-            #Let's get the final state of the pulseblaster. z's are the args we don't need:
-            freqreg0,phasereg0,ampreg0,en0,z,freqreg1,phasereg1,ampreg1,en1,z,flags,z,z,z = pulse_program[-1]
-            finalfreq0 = freqregs[0][freqreg0]*10.0**6 # Front panel expects frequency in Hz
-            finalfreq1 = freqregs[1][freqreg1]*10.0**6 # Front panel expects frequency in Hz
-            finalamp0 = ampregs[0][ampreg0]
-            finalamp1 = ampregs[1][ampreg1]
-            finalphase0 = phaseregs[0][phasereg0]
-            finalphase1 = phaseregs[1][phasereg1]
-            
-            # Always call start_programming regardless of whether we are going to do any
-            # programming or not. This is so that is the programming_scheme is 'pb_stop_programming/STOP'
-            # we are ready to be triggered by a call to pb_stop_programming() even if no programming
-            # occurred due to smart programming:
-            pb_start_programming(PULSE_PROGRAM)
-            
-            if fresh or (self.smart_cache['initial_values'] != initial_values) or \
-                (len(self.smart_cache['pulse_program']) != len(pulse_program)) or \
-                (self.smart_cache['pulse_program'] != pulse_program).any() or \
-                not self.smart_cache['ready_to_go']:
-            
-                self.smart_cache['ready_to_go'] = True
-                self.smart_cache['initial_values'] = initial_values
-
-                # create initial flags string
-                # NOTE: The spinapi can take a string or integer for flags.
-                # If it is a string: 
-                #     flag: 0          12
-                #          '101100011111'
-                #
-                # If it is a binary number:
-                #     flag:12          0
-                #         0b111110001101
-                #
-                # Be warned!
-                initial_flags = ''
-                for i in range(12):
-                    if initial_values['flag %d'%i]:
-                        initial_flags += '1'
-                    else:
-                        initial_flags += '0'
-
-                if self.programming_scheme == 'pb_start/BRANCH':
-                    # Line zero is a wait on the final state of the program in 'pb_start/BRANCH' mode 
-                    pb_inst_dds2(freqreg0,phasereg0,ampreg0,en0,0,freqreg1,phasereg1,ampreg1,en1,0,flags,WAIT,0,100)
-                else:
-                    # Line zero otherwise just contains the initial state 
-                    pb_inst_dds2(0,0,0,initial_values['dds 0']['gate'],0,0,0,0,initial_values['dds 1']['gate'],0,initial_flags, CONTINUE, 0, 100)
-
-                # Line one is a continue with the current front panel values:
-                pb_inst_dds2(0,0,0,initial_values['dds 0']['gate'],0,0,0,0,initial_values['dds 1']['gate'],0,initial_flags, CONTINUE, 0, 100)
-                # Now the rest of the program:
-                if fresh or len(self.smart_cache['pulse_program']) != len(pulse_program) or \
-                (self.smart_cache['pulse_program'] != pulse_program).any():
-                    self.smart_cache['pulse_program'] = pulse_program
-                    for args in pulse_program:
-                        pb_inst_dds2(*args)
-            
-            if self.programming_scheme == 'pb_start/BRANCH':
-                # We will be triggered by pb_start() if we are are the master pseudoclock or a single hardware trigger
-                # from the master if we are not:
-                pb_stop_programming()
-            elif self.programming_scheme == 'pb_stop_programming/STOP':
-                # Don't call pb_stop_programming(). We don't want to pulseblaster to respond to hardware
-                # triggers (such as 50/60Hz line triggers) until we are ready to run.
-                # Our start_method will call pb_stop_programming() when we are ready
-                pass
-            else:
-                raise ValueError('invalid programming_scheme %s'%str(self.programming_scheme))
-            
-            # Are there waits in use in this experiment? The monitor waiting for the end
-            # of the experiment will need to know:
-            wait_monitor_exists = bool(hdf5_file['waits'].attrs['wait_monitor_acquisition_device'])
-            waits_in_use = bool(len(hdf5_file['waits']))
-            self.waits_pending = wait_monitor_exists and waits_in_use
-            if waits_in_use and not wait_monitor_exists:
-                # This should be caught during labscript compilation, but just in case.
-                # Having waits but not a wait monitor means we can't tell when the shot
-                # is over unless the shot ends in a STOP instruction:
-                assert self.programming_scheme == 'pb_stop_programming/STOP'
-
-            # Now we build a dictionary of the final state to send back to the GUI:
-            return_values = {'dds 0':{'freq':finalfreq0, 'amp':finalamp0, 'phase':finalphase0, 'gate':en0},
-                             'dds 1':{'freq':finalfreq1, 'amp':finalamp1, 'phase':finalphase1, 'gate':en1},
-                            }
-            # Since we are converting from an integer to a binary string, we need to reverse the string! (see notes above when we create flags variables)
-            return_flags = str(bin(flags)[2:]).rjust(12,'0')[::-1]
-            for i in range(12):
-                return_values['flag %d'%i] = return_flags[i]
-                
-            return return_values
-            
-    def check_status(self):
-        if self.waits_pending:
-            try:
-                self.all_waits_finished.wait(self.h5file, timeout=0)
-                self.waits_pending = False
-            except zprocess.TimeoutError:
-                pass
-        if self.time_based_shot_end_time is not None:
-            import time
-            time_based_shot_over = time.time() > self.time_based_shot_end_time
-        else:
-            time_based_shot_over = None
-        return pb_read_status(), self.waits_pending, time_based_shot_over
-
-    def transition_to_manual(self):
-        status, waits_pending, time_based_shot_over = self.check_status()
-        
-        if self.programming_scheme == 'pb_start/BRANCH':
-            done_condition = status['waiting']
-        elif self.programming_scheme == 'pb_stop_programming/STOP':
-            done_condition = status['stopped']
-            
-        if time_based_shot_over is not None:
-            done_condition = time_based_shot_over
-            
-        # This is only set to True on a per-shot basis, so reset it to False
-        # for manual mode. Reset associated attributes to None:
-        self.time_based_stop_workaround = False
-        self.time_based_shot_duration = None
-        self.time_based_shot_end_time = None
-        
-        if done_condition and not waits_pending:
-            return True
-        else:
-            return False
-     
-    def abort_buffered(self):
-        # Stop the execution
-        self.pb_stop()
-        # Reset to the beginning of the pulse sequence
-        self.pb_reset()
-                
-        # abort_buffered in the GUI process queues up a program_device state
-        # which will reprogram the device and call pb_start()
-        # This ensures the device isn't accidentally retriggered by another device
-        # while it is running it's abort function
-        return True
-        
-    def abort_transition_to_buffered(self):
-        return True
-        
-    def shutdown(self):
-        #TODO: implement this
-        pass
-      
-
-            
 @runviewer_parser
 class PulseBlasterParser(object):
     num_dds = 2
     num_flags = 12
+
+    # If True, traces other than clock lines and triggers are reduced to the times at
+    # which their values change (and the final time), instead of having one sample per
+    # instruction executed. Clock lines and triggers are always at full resolution,
+    # since runviewer uses their ticks to clock other devices. If None, the
+    # runviewer_change_points_only connection table property of the device is used, so
+    # the usual way to enable it is PulseBlaster(..., runviewer_change_points_only=True)
+    # in the connection table. It can also be set for one parser with the
+    # change_points_only argument, or for all shots here or on a subclass:
+    change_points_only = None
     
-    def __init__(self, path, device):
+    def __init__(self, path, device, change_points_only=None):
         self.path = path
         self.name = device.name
         self.device = device
-        
-        # We create a lookup table for strings to be used later as dictionary keys.
-        # This saves having to evaluate '%d'%i many many times, and makes the _add_pulse_program_row_to_traces method
-        # significantly more efficient
-        self.dds_strings = {}
-        for i in range(self.num_dds):
-            self.dds_strings[i] = {}
-            self.dds_strings[i]['ddsfreq'] = 'dds %d_freq'%i
-            self.dds_strings[i]['ddsamp'] = 'dds %d_amp'%i
-            self.dds_strings[i]['ddsphase'] = 'dds %d_phase'%i
-            self.dds_strings[i]['freq'] = 'freq%d'%i
-            self.dds_strings[i]['amp'] = 'amp%d'%i
-            self.dds_strings[i]['phase'] = 'phase%d'%i
-            self.dds_strings[i]['dds_en'] = 'dds_en%d'%i
-            
-        self.flag_strings = {}
-        self.flag_powers = {}
-        
-        for i in range(self.num_flags):
-            self.flag_strings[i] = 'flag %d'%i
-            self.flag_powers[i] = 2**i
-        
-            
-        
+        if change_points_only is not None:
+            self.change_points_only = change_points_only
+
+    @staticmethod
+    @profile
+    def _expand_loops(pulse_program):
+        """Return an array of the line numbers of the pulse program in the order they
+        are executed, from line two (after the dummy instructions for BLACS) to the
+        end. Loops, including nested loops, are expanded one nesting level at a time,
+        innermost first, with each level expanded in a single vectorized pass."""
+        inst = pulse_program['inst']
+        is_loop = inst == PulseBlaster.pb_instructions['LOOP']
+        is_end_loop = inst == PulseBlaster.pb_instructions['END_LOOP']
+        is_loop[:2] = is_end_loop[:2] = False
+        end_loop_lines = np.flatnonzero(is_end_loop)
+        loop_lines = pulse_program['inst_data'][end_loop_lines]
+        # How many loops each LOOP instruction is nested inside, plus one:
+        depth = np.cumsum(is_loop) - np.cumsum(is_end_loop) + is_end_loop
+        loop_depths = depth[loop_lines]
+
+        executed = np.arange(2, len(pulse_program))
+        for level in range(loop_depths.max() if len(loop_depths) else 0, 0, -1):
+            # The loops at this level each appear once in executed, since their
+            # enclosing loops are not yet expanded. Split executed into units that are
+            # either one of these loops or a single instruction outside them:
+            this_level = loop_depths == level
+            loop_starts = np.flatnonzero(np.isin(executed, loop_lines[this_level]))
+            loop_ends = np.flatnonzero(np.isin(executed, end_loop_lines[this_level])) + 1
+            in_loop = np.zeros(len(executed) + 1, dtype=int)
+            np.add.at(in_loop, loop_starts, 1)
+            np.add.at(in_loop, loop_ends, -1)
+            in_loop = np.cumsum(in_loop[:-1]) > 0
+            is_unit_start = ~in_loop
+            is_unit_start[loop_starts] = True
+            unit_starts = np.flatnonzero(is_unit_start)
+            unit_lengths = np.diff(np.append(unit_starts, len(executed)))
+            unit_reps = np.ones(len(unit_starts), dtype=np.int64)
+            unit_reps[np.searchsorted(unit_starts, loop_starts)] = pulse_program['inst_data'][executed[loop_starts]]
+            # Repeat each unit by its number of repetitions:
+            units = np.repeat(np.arange(len(unit_starts)), unit_reps)
+            lengths = unit_lengths[units]
+            offsets = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+            executed = executed[np.repeat(unit_starts[units], lengths) + offsets]
+        return executed
+
+    @staticmethod
+    def _change_points(clock, values):
+        """Return the trace (clock, values) reduced to its first sample, the samples
+        at which its value changes, and its final sample."""
+        keep = np.ones(len(values), dtype=bool)
+        keep[1:-1] = values[1:-1] != values[:-2]
+        return clock[keep], values[keep]
+
+    @profile
     def get_traces(self, add_trace, parent=None):
         if parent is None:
             # we're the master pseudoclock, software triggered. So we don't have to worry about trigger delays, etc
@@ -1199,89 +1065,56 @@ class PulseBlasterParser(object):
                 dds[i] = {}
                 for reg in ['FREQ', 'AMP', 'PHASE']:
                     dds[i][reg] = f['devices/%s/DDS%d/%s_REGS'%(self.name, i, reg)][:]
-        
-        clock = []
-        traces = {}
-        for i in range(self.num_flags):
-            traces['flag %d'%i] = []
-        for i in range(self.num_dds):
-            for sub_chnl in ['freq', 'amp', 'phase']:
-                traces['dds %d_%s'%(i,sub_chnl)] = []   
-        
-        # now build the traces
+            change_points_only = self.change_points_only
+            if change_points_only is None:
+                props = properties.get(f, self.name, 'connection_table_properties')
+                change_points_only = props.get('runviewer_change_points_only', False)
+
+        executed = self._expand_loops(pulse_program)
+        inst = pulse_program['inst'][executed]
+        is_wait = inst == PulseBlaster.pb_instructions['WAIT']
+
+        # now build the clock. Each instruction's duration is added in turn to the time
+        # it started, as is the trigger delay after a wait if we are not the master
+        # pseudoclock:
         t = 0. if parent is None else PulseBlaster.trigger_delay # Offset by initial trigger of parent
-        i = 0
-        while i < len(pulse_program):
-            # ignore the first 2 instructions, they are dummy instructions for BLACS
-            if i < 2:
-                i += 1
-                continue
-            
-            row = pulse_program[i]
-            
-            if row['inst'] == 2: # Loop
-                loops = int(row['inst_data'])
-                
-                buffer = {}
-                j = i
-                while loops > 0:
-                    looping = True
-                    while looping:
-                        row = pulse_program[j]
-                        # buffer the index of traces used for this instruction
-                        # Cuts the runtime down by ~60%
-                        # start_profile('loop_contents')
-                        if j not in buffer:
-                            clock.append(t)
-                            self._add_pulse_program_row_to_traces(traces, row, dds)
-                            buffer[j] = len(clock)-1
-                        else:                            
-                            clock.append(t)
-                            self._add_pulse_program_row_from_buffer(traces, buffer[j])
-                        # stop_profile('loop_contents')
-                            
-                        # start_profile('end_of_loop')
-                        t+= row['length']*1.0e-9
-                        
-                        if row['inst'] == 3: # END_LOOP
-                            looping = False
-                            # print 'end loop. j=%d, t=%.7f'%(j,t)
-                            j = int(row['inst_data']) if loops > 1 else j
-                            # print 'setting j=%d'%j
-                        else:
-                            # print 'in loop. j=%d, t=%.7f'%(j,t)
-                            j+=1
-                        # stop_profile('end_of_loop')
-                    loops -= 1
-                    
-                i = j
-                # print 'i now %d'%i
-                    
-            else: # Continue
-                if row['inst'] == 8: #WAIT
-                    print('Wait at %.9f'%t)
-                    pass
-                clock.append(t)
-                self._add_pulse_program_row_to_traces(traces,row,dds)
-                t+= row['length']*1.0e-9
-            
-                if row['inst'] == 8 and parent is not None: #WAIT
-                    #TODO: Offset next time by trigger delay is not master pseudoclock
-                    t+= PulseBlaster.trigger_delay
-                    
-            
-            i += 1            
-                
+        durations = pulse_program['length'][executed]*1.0e-9
+        # The delay of a LONG_DELAY instruction is repeated inst_data times:
+        is_long_delay = inst == PulseBlaster.pb_instructions['LONG_DELAY']
+        durations[is_long_delay] *= pulse_program['inst_data'][executed[is_long_delay]]
+        if parent is not None and is_wait.any():
+            #TODO: Offset next time by trigger delay is not master pseudoclock
+            wait_indices = np.flatnonzero(is_wait)
+            durations = np.insert(durations, wait_indices + 1, PulseBlaster.trigger_delay)
+            starts = np.arange(len(executed)) + np.searchsorted(wait_indices, np.arange(len(executed)))
+        else:
+            starts = np.arange(len(executed))
+        times = np.cumsum(np.concatenate([[t], durations]))
+        clock = times[starts]
+        t = times[-1]
+        for wait_time in clock[is_wait]:
+            print('Wait at %.9f'%wait_time)
         print('Stop time: %.9f'%t)
-        # now put together the traces
+
+        # now put together the traces, decoding each line of the pulse program once
+        # and then indexing by the lines executed:
         to_return = {}
-        clock = np.array(clock, dtype=np.float64)
-        for name, data in traces.items():
-            to_return[name] = (clock, np.array(data))
-            
+        flags = pulse_program['flags'][executed]
+        for i in range(self.num_flags):
+            to_return['flag %d'%i] = (clock, (flags >> i) & 1)
+        for i in range(self.num_dds):
+            to_return['dds %d_freq'%i] = (clock, dds[i]['FREQ'][pulse_program['freq%d'%i][executed]])
+            to_return['dds %d_phase'%i] = (clock, dds[i]['PHASE'][pulse_program['phase%d'%i][executed]])
+            amp = np.where(pulse_program['dds_en%d'%i] != 0, dds[i]['AMP'][pulse_program['amp%d'%i]], 0)
+            to_return['dds %d_amp'%i] = (clock, amp[executed])
         
         # if slow_clock_flag is not None:
             # to_return['slow clock'] = to_return['flag %d'%slow_clock_flag[0]]
+
+        if change_points_only:
+            outputs = dict((name, self._change_points(*trace)) for name, trace in to_return.items())
+        else:
+            outputs = to_return
             
         clocklines_and_triggers = {}
         for pseudoclock_name, pseudoclock in self.device.child_list.items():
@@ -1297,54 +1130,21 @@ class PulseBlasterParser(object):
                                 if channel.device_class == 'DDS':
                                     for subchnl_name, subchnl in channel.child_list.items():
                                         connection = '%s_%s'%(channel.parent_port, subchnl.parent_port)
-                                        if connection in to_return:
-                                            add_trace(subchnl.name, to_return[connection], parent_device_name, connection)
+                                        if connection in outputs:
+                                            add_trace(subchnl.name, outputs[connection], parent_device_name, connection)
                                 else:
-                                    add_trace(channel_name, to_return[channel.parent_port], parent_device_name, channel.parent_port)
+                                    add_trace(channel_name, outputs[channel.parent_port], parent_device_name, channel.parent_port)
                 else:
                     clocklines_and_triggers[clock_line_name] = to_return[clock_line.parent_port]
                     add_trace(clock_line_name, to_return[clock_line.parent_port], self.name, clock_line.parent_port)
             
         return clocklines_and_triggers
-    
-    @profile
-    def _add_pulse_program_row_from_buffer(self, traces, index):
-        for i in range(self.num_flags):
-            traces[self.flag_strings[i]].append(traces[self.flag_strings[i]][index])
-            
-        for i in range(self.num_dds):
-            current_strings = self.dds_strings[i]
-            traces[current_strings['ddsfreq']].append(traces[current_strings['ddsfreq']][index])
-            traces[current_strings['ddsphase']].append(traces[current_strings['ddsphase']][index])
-            traces[current_strings['ddsamp']].append(traces[current_strings['ddsamp']][index])
-            
-    @profile            
-    def _add_pulse_program_row_to_traces(self, traces, row, dds, flags = None):
-        # add flags
-        if flags is None:
-            flags = np.binary_repr(row['flags'],self.num_flags)[::-1]
-        for i in range(self.num_flags):
-            traces[self.flag_strings[i]].append(int(flags[i]))
-        
-        # Below block saved for history. This is much slower compared to what is below!
-        # for i in range(self.num_dds):
-            # traces['dds %d_freq'%i].append(dds[i]['FREQ'][row['freq%d'%i]])
-            # traces['dds %d_phase'%i].append(dds[i]['PHASE'][row['phase%d'%i]])
-            # amp = dds[i]['AMP'][row['amp%d'%i]] if row['dds_en%d'%i] else 0
-            # traces['dds %d_amp'%i].append(amp)
-            
-       
-        # note that we are looking up keys for the traces dictionary and row array in self.dds_strings
-        # Doing this reduces the runtime (of the below block) by 25%
-        for i in range(self.num_dds):
-            # Note: This is done to reduce runtime (about 10%)
-            current_strings = self.dds_strings[i]
-            current_dds = dds[i]
-            
-            traces[current_strings['ddsfreq']].append(current_dds['FREQ'][row[current_strings['freq']]])
-            traces[current_strings['ddsphase']].append(current_dds['PHASE'][row[current_strings['phase']]])
-            # Note: Using the inline if statement reduces the runtime (of this for loop) by 50%
-            amp = current_dds['AMP'][row[current_strings['amp']]] if row[current_strings['dds_en']] else 0
-            traces[current_strings['ddsamp']].append(amp)
-            
-            
+
+
+# For backwards compatibility with code importing these from their old location:
+PulseBlasterTab = deprecated_import_alias(
+    "labscript_devices.blacs_classes.PulseBlaster.PulseBlasterTab"
+)
+PulseblasterWorker = deprecated_import_alias(
+    "labscript_devices.blacs_classes.PulseBlaster.PulseblasterWorker"
+)
@@ -15,8 +15,8 @@ from labscript_utils import PY2
 if PY2:
     str = unicode
 
-from labscript_devices import BLACS_tab, runviewer_parser
-from labscript_devices.PulseBlaster_No_DDS import PulseBlaster_No_DDS, Pulseblaster_No_DDS_Tab, PulseblasterNoDDSWorker, PulseBlaster_No_DDS_Parser
+from labscript_devices import runviewer_parser, deprecated_import_alias
+from labscript_devices.PulseBlaster_No_DDS import PulseBlaster_No_DDS, PulseBlaster_No_DDS_Parser
 
 
 class PulseBlasterESRPro200(PulseBlaster_No_DDS):
@@ -27,20 +27,16 @@ class PulseBlasterESRPro200(PulseBlaster_No_DDS):
     core_clock_freq = 200.0
 
 
-@BLACS_tab
-class pulseblasteresrpro200(Pulseblaster_No_DDS_Tab):
-    # Capabilities
-    num_DO = 21
-    def __init__(self,*args,**kwargs):
-        self.device_worker_class = PulseblasterESRPro200Worker 
-        Pulseblaster_No_DDS_Tab.__init__(self,*args,**kwargs)
-
-
-class PulseblasterESRPro200Worker(PulseblasterNoDDSWorker):
-    core_clock_freq = 200.0
-
-
 @runviewer_parser
 class PulseblasterESRPro200Parser(PulseBlaster_No_DDS_Parser):
     num_dds = 0
     num_flags = 21
+
+
+# For backwards compatibility with code importing these from their old location:
+pulseblasteresrpro200 = deprecated_import_alias(
+    "labscript_devices.blacs_classes.PulseBlasterESRPro200.pulseblasteresrpro200"
+)
+PulseblasterESRPro200Worker = deprecated_import_alias(
+    "labscript_devices.blacs_classes.PulseBlasterESRPro200.PulseblasterESRPro200Worker"
+)
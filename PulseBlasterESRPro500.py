@@ -15,8 +15,8 @@ from labscript_utils import PY2
 if PY2:
     str = unicode
 
-from labscript_devices import  BLACS_tab, runviewer_parser
-from labscript_devices.PulseBlaster_No_DDS import PulseBlaster_No_DDS, Pulseblaster_No_DDS_Tab, PulseblasterNoDDSWorker
+from labscript_devices import runviewer_parser, deprecated_import_alias
+from labscript_devices.PulseBlaster_No_DDS import PulseBlaster_No_DDS
 
 
 class PulseBlasterESRPro500(PulseBlaster_No_DDS):
@@ -27,16 +27,10 @@ class PulseBlasterESRPro500(PulseBlaster_No_DDS):
     core_clock_freq = 500.0
 
 
-@BLACS_tab    
-class pulseblasteresrpro500(Pulseblaster_No_DDS_Tab):
-    # Capabilities
-    num_DO = 21
-    def __init__(self,*args,**kwargs):
-        self.device_worker_class = PulseblasterESRPro500Worker 
-        Pulseblaster_No_DDS_Tab.__init__(self,*args,**kwargs)
-    
-    
-class PulseblasterESRPro500Worker(PulseblasterNoDDSWorker):
-    core_clock_freq = 500.0
-    
-     
+# For backwards compatibility with code importing these from their old location:
+pulseblasteresrpro500 = deprecated_import_alias(
+    "labscript_devices.blacs_classes.PulseBlasterESRPro500.pulseblasteresrpro500"
+)
+PulseblasterESRPro500Worker = deprecated_import_alias(
+    "labscript_devices.blacs_classes.PulseBlasterESRPro500.PulseblasterESRPro500Worker"
+)
@@ -15,11 +15,9 @@ from labscript_utils import PY2
 if PY2:
     str = unicode
 
-from labscript_devices import BLACS_tab, runviewer_parser
+from labscript_devices import runviewer_parser, deprecated_import_alias
 from labscript_devices.PulseBlaster_No_DDS import (
     PulseBlaster_No_DDS,
-    Pulseblaster_No_DDS_Tab,
-    PulseblasterNoDDSWorker,
     PulseBlaster_No_DDS_Parser,
 )
 
@@ -32,20 +30,15 @@ class PulseBlasterUSB(PulseBlaster_No_DDS):
     core_clock_freq = 100.0
 
 
-@BLACS_tab
-class PulseblasterUSBTab(Pulseblaster_No_DDS_Tab):
-    # Capabilities
-    num_DO = 24
-    def __init__(self,*args,**kwargs):
-        self.device_worker_class = PulseblasterUSBWorker 
-        Pulseblaster_No_DDS_Tab.__init__(self,*args,**kwargs)
-
-
-class PulseblasterUSBWorker(PulseblasterNoDDSWorker):
-    core_clock_freq = 100.0
-
 @runviewer_parser
 class PulseBlasterUSBParser(PulseBlaster_No_DDS_Parser):
     pass
 
 
+# For backwards compatibility with code importing these from their old location:
+PulseblasterUSBTab = deprecated_import_alias(
+    "labscript_devices.blacs_classes.PulseBlasterUSB.PulseblasterUSBTab"
+)
+PulseblasterUSBWorker = deprecated_import_alias(
+    "labscript_devices.blacs_classes.PulseBlasterUSB.PulseblasterUSBWorker"
+)
@@ -15,8 +15,8 @@ from labscript_utils import PY2
 if PY2:
     str = unicode
 
-from labscript_devices import BLACS_tab, runviewer_parser
-from labscript_devices.PulseBlaster_No_DDS import PulseBlaster_No_DDS, Pulseblaster_No_DDS_Tab, PulseblasterNoDDSWorker
+from labscript_devices import runviewer_parser, deprecated_import_alias
+from labscript_devices.PulseBlaster_No_DDS import PulseBlaster_No_DDS
 from labscript_devices.PulseBlaster import PulseBlasterParser
 
 
@@ -33,19 +33,16 @@ class PulseBlaster_SP2_24_100_32k(PulseBlaster_No_DDS):
         PulseBlaster_No_DDS.__init__(self, *args, **kwargs)
 
 
-@BLACS_tab    
-class PulseBlaster_SP2_24_100_32k_Tab(Pulseblaster_No_DDS_Tab):
-    num_DO = 24
-    def __init__(self,*args,**kwargs):
-        self.device_worker_class = PulseBlaster_SP2_24_100_32k_Worker 
-        Pulseblaster_No_DDS_Tab.__init__(self,*args,**kwargs)
-    
-    
-class PulseBlaster_SP2_24_100_32k_Worker(PulseblasterNoDDSWorker):
-    core_clock_freq = 100.0
-    
-     
 @runviewer_parser
 class PulseBlaster_SP2_24_100_32k_Parser(PulseBlasterParser):
     num_dds = 0
-    num_flags = 24
\ No newline at end of file
+    num_flags = 24
+
+
+# For backwards compatibility with code importing these from their old location:
+PulseBlaster_SP2_24_100_32k_Tab = deprecated_import_alias(
+    "labscript_devices.blacs_classes.PulseBlaster_SP2_24_100_32k.PulseBlaster_SP2_24_100_32k_Tab"
+)
+PulseBlaster_SP2_24_100_32k_Worker = deprecated_import_alias(
+    "labscript_devices.blacs_classes.PulseBlaster_SP2_24_100_32k.PulseBlaster_SP2_24_100_32k_Worker"
+)
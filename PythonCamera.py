@@ -19,8 +19,8 @@ except ImportError:
     
 check_version('labscript', '2.0.1', '3')
 
-from labscript_devices import BLACS_tab
-from labscript_devices.Camera import Camera, CameraTab
+from labscript_devices import deprecated_import_alias
+from labscript_devices.Camera import Camera
 from labscript import set_passed_properties
 
 
@@ -46,6 +46,7 @@ class PythonCamera(Camera):
                           location='device_properties', overwrite=True)
 
 
-@BLACS_tab
-class PythonCameraTab(CameraTab):
-    pass
+# For backwards compatibility with code importing these from their old location:
+PythonCameraTab = deprecated_import_alias(
+    "labscript_devices.blacs_classes.PythonCamera.PythonCameraTab"
+)
@@ -13,14 +13,19 @@ if PY2:
 
 import os
 import sys
+import json
 import importlib
-import imp
 import warnings
 import traceback
 import inspect
 from labscript_utils import labscript_suite_install_dir, dedent
 from labscript_utils.labconfig import LabConfig
 
+if PY2:
+    import imp
+else:
+    import importlib.util
+
 __version__ = '2.6.0'
 
 check_version('qtutils', '2.0.0', '3.0.0')
@@ -60,7 +65,9 @@ in the classes themselves. This ensures imports can be deferred until the classe
 actually needed. When BLACS and runviewer look up classes with get_BLACS_tab() and
 get_runviewer_parser(), populate_registry() will be called in order to find all files
 called 'register_classes.py' within subfolders (at any depth) of labscript_devices, and
-they will be imported to run their code and hence register their classes.
+they will be imported to run their code and hence register their classes. The resulting
+registry is saved to an index file, which is used instead on subsequent startups as long
+as no folders or 'register_classes.py' files have been added, removed or modified since.
 
 The "new" method does not impose any restrictions on code organisation within subfolders
 of labscript_devices, and so is preferable as it allows auxiliary utilities or resource
@@ -225,13 +232,25 @@ BLACS_tab_registry = {}
 runviewer_parser_registry = {}
 # The script files that registered each device, for use in error messages:
 _register_classes_script_files = {}
+# Classes that have been looked up in the registries, keyed by their fully qualified
+# names, so that repeated lookups need not go through the import machinery:
+_imported_classes = {}
+
+
+def _import_registered_class(fullname):
+    try:
+        return _imported_classes[fullname]
+    except KeyError:
+        cls = _imported_classes[fullname] = import_class_by_fullname(fullname)
+        return cls
+
 
 # Wrapper functions to get devices out of the class registries.
 def get_BLACS_tab(name):
     if not BLACS_tab_registry:
         populate_registry()
     if name in BLACS_tab_registry:
-        return import_class_by_fullname(BLACS_tab_registry[name])
+        return _import_registered_class(BLACS_tab_registry[name])
     # Fall back on file naming convention + decorator method:
     return BLACS_tab[name]
 
@@ -240,7 +259,7 @@ def get_runviewer_parser(name):
     if not runviewer_parser_registry:
         populate_registry()
     if name in runviewer_parser_registry:
-        return import_class_by_fullname(runviewer_parser_registry[name])
+        return _import_registered_class(runviewer_parser_registry[name])
     # Fall back on file naming convention + decorator method:
     return runviewer_parser[name]
 
@@ -268,25 +287,144 @@ def register_classes(labscript_device_name, BLACS_tab=None, runviewer_parser=Non
     _register_classes_script_files[labscript_device_name] = script_filename
 
 
-def populate_registry():
+# Where populate_registry() saves the registry, along with the modification times needed
+# to tell whether it is still up to date:
+REGISTRY_INDEX_FILE = os.path.join(
+    labscript_suite_install_dir, 'app_saved_configs', 'labscript_devices', 'registry_index.json'
+)
+# To be incremented if the format of the index changes:
+REGISTRY_INDEX_VERSION = 2
+
+
+def _walk_device_dirs():
+    """Walk the device folders, returning a list of the register_classes.py files found,
+    and a dict of modification times keyed by path. These are of every folder walked,
+    since a folder's modification time changes whenever a file or subfolder is added
+    to, removed from or renamed within it, and of every file within the folders
+    containing a register_classes.py file and their subfolders. The latter include any
+    data files that a register_classes.py file builds its registrations from, such as
+    NI_DAQmx's models/capabilities.json."""
+    scripts = []
+    mtimes = {}
+    for devices_dir in LABSCRIPT_DEVICES_DIRS:
+        # Folders containing a register_classes.py file, with a trailing separator:
+        device_folders = []
+        for folder, subfolders, filenames in os.walk(devices_dir):
+            # Skip bytecode caches, whose modification times change whenever a module is
+            # compiled, and hidden folders such as .git:
+            subfolders[:] = [
+                s for s in subfolders if s != '__pycache__' and not s.startswith('.')
+            ]
+            mtimes[folder] = os.path.getmtime(folder)
+            if 'register_classes.py' in filenames:
+                scripts.append(os.path.join(folder, 'register_classes.py'))
+                device_folders.append(os.path.join(folder, ''))
+            if os.path.join(folder, '').startswith(tuple(device_folders)):
+                for filename in filenames:
+                    if filename.startswith('.') or filename.endswith(('.pyc', '.pyo')):
+                        continue
+                    path = os.path.join(folder, filename)
+                    mtimes[path] = os.path.getmtime(path)
+    return scripts, mtimes
+
+
+def _load_registry_index():
+    """Return the registry saved by _save_registry_index(), or None if there is no
+    saved registry or if any of the paths it depends on have been modified since"""
+    try:
+        with open(REGISTRY_INDEX_FILE) as f:
+            index = json.load(f)
+        if index['version'] != REGISTRY_INDEX_VERSION:
+            return None
+        if index['device_dirs'] != LABSCRIPT_DEVICES_DIRS:
+            return None
+        for path, mtime in index['mtimes'].items():
+            if os.path.getmtime(path) != mtime:
+                return None
+        return index['registry']
+    except (IOError, OSError, ValueError, KeyError, TypeError):
+        # Missing, unreadable or corrupt, or one of the paths no longer exists:
+        return None
+
+
+def _save_registry_index(mtimes):
+    registry = {}
+    for name, script_filename in _register_classes_script_files.items():
+        BLACS_tab = BLACS_tab_registry[name]
+        runviewer_parser = runviewer_parser_registry[name]
+        registry[name] = [BLACS_tab, runviewer_parser, script_filename]
+    index = {
+        'version': REGISTRY_INDEX_VERSION,
+        'device_dirs': LABSCRIPT_DEVICES_DIRS,
+        'mtimes': mtimes,
+        'registry': registry,
+    }
+    # Write to a temporary file in the same directory and then move it into place, so
+    # that another process starting up at the same time never reads a partially
+    # written index. The filename is unique to this process in case others are also
+    # saving the index:
+    temp_filename = REGISTRY_INDEX_FILE + '.%d.tmp' % os.getpid()
+    try:
+        if not os.path.exists(os.path.dirname(REGISTRY_INDEX_FILE)):
+            os.makedirs(os.path.dirname(REGISTRY_INDEX_FILE))
+        with open(temp_filename, 'w') as f:
+            json.dump(index, f, indent=4, sort_keys=True)
+        if PY2:
+            # No os.replace, and os.rename does not overwrite existing files on Windows:
+            if os.path.exists(REGISTRY_INDEX_FILE):
+                os.remove(REGISTRY_INDEX_FILE)
+            os.rename(temp_filename, REGISTRY_INDEX_FILE)
+        else:
+            os.replace(temp_filename, REGISTRY_INDEX_FILE)
+    except (IOError, OSError):
+        # The index is only an optimisation, we can do without it:
+        try:
+            os.remove(temp_filename)
+        except OSError:
+            pass
+
+
+def _run_register_classes_script(path, module_name):
+    """Import the register_classes.py file at the given path as module_name"""
+    if PY2:
+        # Open the file using the import machinery, and import it as module_name.
+        fp, pathname, desc = imp.find_module('register_classes', [os.path.dirname(path)])
+        imp.load_module(module_name, fp, pathname, desc)
+    else:
+        spec = importlib.util.spec_from_file_location(module_name, path)
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[module_name] = module
+        spec.loader.exec_module(module)
+
+
+def populate_registry(use_index=True):
     """Walk the labscript_devices folder looking for files called register_classes.py,
     and run them (i.e. import them). These files are expected to make calls to
     register_classes() to inform us of what BLACS tabs and runviewer classes correspond
-    to their labscript device classes."""
+    to their labscript device classes. The resulting registry is saved to
+    REGISTRY_INDEX_FILE. If use_index is True and the saved registry is up to date,
+    it is loaded instead, without walking the folders or running any scripts. The
+    saved registry is considered out of date if any folder, or any file in a folder
+    containing a register_classes.py file or in one of its subfolders, has been
+    modified, added or removed since."""
+    if use_index:
+        registry = _load_registry_index()
+        if registry is not None:
+            for name, (BLACS_tab, runviewer_parser, script_filename) in registry.items():
+                BLACS_tab_registry[name] = BLACS_tab
+                runviewer_parser_registry[name] = runviewer_parser
+                _register_classes_script_files[name] = script_filename
+            return
+    # Get the modification times before running any of the scripts, so that if they
+    # are modified in the meantime, the index will be out of date:
+    scripts, mtimes = _walk_device_dirs()
     # We import the register_classes modules as a direct submodule of labscript_devices.
     # But they cannot all have the same name, so we import them as
-    # labscript_devices._register_classes_script_<num> with increasing number.
-    module_num = 0
-    for devices_dir in LABSCRIPT_DEVICES_DIRS:
-        for folder, _, filenames in os.walk(devices_dir):
-            if 'register_classes.py' in filenames:
-                # The module name is the path to the file, relative to the labscript suite
-                # install directory:
-                # Open the file using the import machinery, and import it as module_name.
-                fp, pathname, desc = imp.find_module('register_classes', [folder])
-                module_name = 'labscript_devices._register_classes_%d' % module_num
-                _ = imp.load_module(module_name, fp, pathname, desc)
-                module_num += 1
+    # labscript_devices._register_classes_<num> with increasing number.
+    for module_num, path in enumerate(scripts):
+        module_name = 'labscript_devices._register_classes_%d' % module_num
+        _run_register_classes_script(path, module_name)
+    _save_registry_index(mtimes)
 
 
 if __name__ == '__main__':
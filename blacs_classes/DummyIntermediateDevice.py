@@ -0,0 +1,46 @@
+#####################################################################
+#                                                                   #
+# /blacs_classes/DummyIntermediateDevice.py                         #
+#                                                                   #
+# Copyright 2013, Monash University                                 #
+#                                                                   #
+# This file is part of labscript_devices, in the labscript suite    #
+# (see http://labscriptsuite.org), and is licensed under the        #
+# Simplified BSD License. See the license.txt file in the root of   #
+# the project for the full license.                                 #
+#                                                                   #
+#####################################################################
+from __future__ import division, unicode_literals, print_function, absolute_import
+from labscript_utils import PY2
+if PY2:
+    str = unicode
+
+from blacs.device_base_class import DeviceTab
+from blacs.tab_base_classes import Worker
+
+class DummyIntermediateDeviceTab(DeviceTab):
+    def initialise_GUI(self):
+        self.create_worker("main_worker",DummyIntermediateDeviceWorker,{})
+        self.primary_worker = "main_worker"
+
+class DummyIntermediateDeviceWorker(Worker):
+    def init(self):
+        pass
+
+    def program_manual(self, front_panel_values):
+        return front_panel_values 
+
+    def transition_to_buffered(self, device_name, h5file, initial_values, fresh):
+        return initial_values
+
+    def transition_to_manual(self,abort = False):
+        return True
+
+    def abort_transition_to_buffered(self):
+        return self.transition_to_manual(True)
+        
+    def abort_buffered(self):
+        return self.transition_to_manual(True)
+
+    def shutdown(self):
+        pass
@@ -0,0 +1,30 @@
+#####################################################################
+#                                                                   #
+# /blacs_classes/PulseBlasterESRPro200.py                           #
+#                                                                   #
+# Copyright 2013, Monash University                                 #
+#                                                                   #
+# This file is part of labscript_devices, in the labscript suite    #
+# (see http://labscriptsuite.org), and is licensed under the        #
+# Simplified BSD License. See the license.txt file in the root of   #
+# the project for the full license.                                 #
+#                                                                   #
+#####################################################################
+from __future__ import division, unicode_literals, print_function, absolute_import
+from labscript_utils import PY2
+if PY2:
+    str = unicode
+
+from labscript_devices.blacs_classes.PulseBlaster_No_DDS import Pulseblaster_No_DDS_Tab, PulseblasterNoDDSWorker
+
+
+class pulseblasteresrpro200(Pulseblaster_No_DDS_Tab):
+    # Capabilities
+    num_DO = 21
+    def __init__(self,*args,**kwargs):
+        self.device_worker_class = PulseblasterESRPro200Worker 
+        Pulseblaster_No_DDS_Tab.__init__(self,*args,**kwargs)
+
+
+class PulseblasterESRPro200Worker(PulseblasterNoDDSWorker):
+    core_clock_freq = 200.0
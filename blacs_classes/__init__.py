@@ -0,0 +1,15 @@
+#####################################################################
+#                                                                   #
+# /labscript_devices/blacs_classes/__init__.py                      #
+#                                                                   #
+# Copyright 2019, Monash University                                 #
+#                                                                   #
+# This file is part of labscript_devices, in the labscript suite    #
+# (see http://labscriptsuite.org), and is licensed under the        #
+# Simplified BSD License. See the license.txt file in the root of   #
+# the project for the full license.                                 #
+#                                                                   #
+#####################################################################
+"""BLACS tabs and workers of devices whose labscript classes are defined in single
+modules at the top level of labscript_devices. Keeping them here means that importing
+those modules to compile shots does not import BLACS and Qt."""
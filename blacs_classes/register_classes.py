@@ -0,0 +1,115 @@
+#####################################################################
+#                                                                   #
+# /labscript_devices/blacs_classes/register_classes.py              #
+#                                                                   #
+# Copyright 2019, Monash University                                 #
+#                                                                   #
+# This file is part of labscript_devices, in the labscript suite    #
+# (see http://labscriptsuite.org), and is licensed under the        #
+# Simplified BSD License. See the license.txt file in the root of   #
+# the project for the full license.                                 #
+#                                                                   #
+#####################################################################
+import labscript_devices
+
+labscript_devices.register_classes(
+    'PulseBlaster',
+    BLACS_tab='labscript_devices.blacs_classes.PulseBlaster.PulseBlasterTab',
+    runviewer_parser='labscript_devices.PulseBlaster.PulseBlasterParser',
+)
+
+labscript_devices.register_classes(
+    'NovaTechDDS9M',
+    BLACS_tab='labscript_devices.blacs_classes.NovaTechDDS9M.NovatechDDS9MTab',
+    runviewer_parser='labscript_devices.NovaTechDDS9M.RunviewerClass',
+)
+
+labscript_devices.register_classes(
+    'LightCrafterDMD',
+    BLACS_tab='labscript_devices.blacs_classes.LightCrafterDMD.LightCrafterTab',
+    runviewer_parser=None,
+)
+
+labscript_devices.register_classes(
+    'AlazarTechBoard',
+    BLACS_tab='labscript_devices.blacs_classes.AlazarTechBoard.GuilessTab',
+    runviewer_parser=None,
+)
+
+labscript_devices.register_classes(
+    'PulseBlaster_No_DDS',
+    BLACS_tab='labscript_devices.blacs_classes.PulseBlaster_No_DDS.Pulseblaster_No_DDS_Tab',
+    runviewer_parser='labscript_devices.PulseBlaster_No_DDS.PulseBlaster_No_DDS_Parser',
+)
+
+labscript_devices.register_classes(
+    'PulseBlasterUSB',
+    BLACS_tab='labscript_devices.blacs_classes.PulseBlasterUSB.PulseblasterUSBTab',
+    runviewer_parser='labscript_devices.PulseBlasterUSB.PulseBlasterUSBParser',
+)
+
+labscript_devices.register_classes(
+    'PulseBlasterESRPro200',
+    BLACS_tab='labscript_devices.blacs_classes.PulseBlasterESRPro200.pulseblasteresrpro200',
+    runviewer_parser='labscript_devices.PulseBlasterESRPro200.PulseblasterESRPro200Parser',
+)
+
+labscript_devices.register_classes(
+    'PulseBlasterESRPro500',
+    BLACS_tab='labscript_devices.blacs_classes.PulseBlasterESRPro500.pulseblasteresrpro500',
+    runviewer_parser=None,
+)
+
+labscript_devices.register_classes(
+    'PulseBlaster_SP2_24_100_32k',
+    BLACS_tab='labscript_devices.blacs_classes.PulseBlaster_SP2_24_100_32k.PulseBlaster_SP2_24_100_32k_Tab',
+    runviewer_parser='labscript_devices.PulseBlaster_SP2_24_100_32k.PulseBlaster_SP2_24_100_32k_Parser',
+)
+
+labscript_devices.register_classes(
+    'PineBlaster',
+    BLACS_tab='labscript_devices.blacs_classes.PineBlaster.PineblasterTab',
+    runviewer_parser='labscript_devices.PineBlaster.RunviewerClass',
+)
+
+labscript_devices.register_classes(
+    'RFBlaster',
+    BLACS_tab='labscript_devices.blacs_classes.RFBlaster.RFBlasterTab',
+    runviewer_parser=None,
+)
+
+labscript_devices.register_classes(
+    'PhaseMatrixQuickSyn',
+    BLACS_tab='labscript_devices.blacs_classes.PhaseMatrixQuickSyn.PhaseMatrixQuickSynTab',
+    runviewer_parser=None,
+)
+
+labscript_devices.register_classes(
+    'ZaberStageController',
+    BLACS_tab='labscript_devices.blacs_classes.ZaberStageController.ZaberstageControllerTab',
+    runviewer_parser=None,
+)
+
+labscript_devices.register_classes(
+    'Camera',
+    BLACS_tab='labscript_devices.blacs_classes.Camera.CameraTab',
+    runviewer_parser=None,
+)
+
+labscript_devices.register_classes(
+    'PythonCamera',
+    BLACS_tab='labscript_devices.blacs_classes.PythonCamera.PythonCameraTab',
+    runviewer_parser=None,
+)
+
+labscript_devices.register_classes(
+    'DummyIntermediateDevice',
+    BLACS_tab='labscript_devices.blacs_classes.DummyIntermediateDevice.DummyIntermediateDeviceTab',
+    runviewer_parser=None,
+)
+
+labscript_devices.register_classes(
+    'CiceroOpalKellyXEM3001',
+    BLACS_tab='labscript_devices.blacs_classes.CiceroOpalKellyXEM3001.CiceroOpalKellyXEM3001Tab',
+    runviewer_parser='labscript_devices.CiceroOpalKellyXEM3001.RunviewerClass',
+)
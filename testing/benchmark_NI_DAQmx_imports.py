@@ -0,0 +1,73 @@
+"""Benchmark the time taken to import NI DAQmx model classes, without any hardware.
+
+Each case is timed in a fresh Python interpreter, so that nothing is already
+imported, and the fastest of a number of repeats is reported along with the number
+of model modules that were imported. On Python 3.7 and above, model classes are
+only imported when first accessed, so importing a single model should be much
+faster than importing all of them, which is what every connection table compile
+and BLACS startup used to do. Importing the models package, as the BLACS tab does,
+no longer imports any models, nor the NI_DAQmx base class and labscript itself:
+
+    python benchmark_NI_DAQmx_imports.py --repeats 10
+"""
+from __future__ import division, unicode_literals, print_function, absolute_import
+from labscript_utils import PY2
+if PY2:
+    str = unicode
+
+import sys
+import argparse
+import subprocess
+
+# The statements to time, each run in a fresh interpreter:
+CASES = [
+    ('models', 'import labscript_devices.NI_DAQmx.models'),
+    ('base class', 'import labscript_devices.NI_DAQmx.labscript_devices'),
+    ('one model', 'from labscript_devices.NI_DAQmx.labscript_devices import NI_PCIe_6363'),
+    ('two models', 'from labscript_devices.NI_DAQmx.models import NI_PCIe_6363, NI_USB_6229'),
+    ('all models', 'from labscript_devices.NI_DAQmx.models import *'),
+]
+
+# Run in the fresh interpreter to time the statement and count the model modules that
+# it imported:
+TIMER = """
+import sys
+try:
+    from time import perf_counter
+except ImportError:
+    from time import time as perf_counter
+import numpy, labscript_devices
+start_time = perf_counter()
+%s
+elapsed = perf_counter() - start_time
+prefix = 'labscript_devices.NI_DAQmx.models.NI_'
+print(elapsed, len([name for name in sys.modules if name.startswith(prefix)]))
+"""
+
+
+def time_import(statement):
+    """Run the statement in a fresh interpreter, returning the time taken and the
+    number of model modules imported. numpy and labscript_devices are imported first
+    so that only the cost of the NI DAQmx modules, and of labscript if they import
+    it, is measured"""
+    output = subprocess.check_output([sys.executable, '-c', TIMER % statement])
+    elapsed, n_models = output.split()[-2:]
+    return float(elapsed), int(n_models)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeats', type=int, default=5,
+                        help='time each case this many times, reporting the fastest')
+    args = parser.parse_args()
+
+    for name, statement in CASES:
+        results = [time_import(statement) for _ in range(args.repeats)]
+        elapsed = min(elapsed for elapsed, _ in results)
+        n_models = results[0][1]
+        print('%-12s %10.1f ms %4d model modules imported' % (name, elapsed * 1e3, n_models))
+        sys.stdout.flush()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,272 @@
+"""Benchmark the time taken by the generate_code() methods of pseudoclock devices
+and the devices they clock, without any hardware.
+
+Each case compiles a synthetic shot with a master pseudoclock clocking an NI DAQmx
+device, whose analog outputs ramp through a configurable number of clock ticks.
+The ramps are split into segments of alternating sample rate, so that the number
+of pseudoclock instructions grows with the number of ticks, and digital outputs
+change at the start of each segment. Optionally a number of waits are inserted
+between segments, and for the PulseBlaster, DDS outputs on both the PulseBlaster
+itself and a NovaTechDDS9M change at the start of each segment.
+
+For each case, the time spent in each device's own generate_code() (excluding the
+time spent in those of its children) is reported along with the resulting
+throughput in clock ticks per second, and the peak memory allocated during
+compilation. Results can be saved as JSON and compared against a previous run:
+
+    python benchmark_generate_code.py --output before.json
+    # ...make changes...
+    python benchmark_generate_code.py --compare before.json
+
+Cases that exceed the limits of a device (such as the number of instructions the
+CiceroOpalKellyXEM3001 can hold) are reported as such rather than timed.
+"""
+from __future__ import division, unicode_literals, print_function, absolute_import
+from labscript_utils import PY2
+if PY2:
+    str = unicode
+
+import os
+import sys
+import json
+import shutil
+import argparse
+import tempfile
+import itertools
+from collections import defaultdict
+try:
+    from time import perf_counter
+except ImportError:
+    # Python 2:
+    from time import time as perf_counter
+try:
+    import tracemalloc
+except ImportError:
+    # Python 2:
+    tracemalloc = None
+
+from labscript import (
+    ClockLine,
+    AnalogOut,
+    DigitalOut,
+    DDS,
+    WaitMonitor,
+    LabscriptError,
+    labscript_init,
+    labscript_cleanup,
+    start,
+    stop,
+    wait,
+)
+from labscript_devices.PulseBlaster import PulseBlaster
+from labscript_devices.PineBlaster import PineBlaster
+from labscript_devices.CiceroOpalKellyXEM3001 import CiceroOpalKellyXEM3001
+from labscript_devices.NovaTechDDS9M import NovaTechDDS9M
+from labscript_devices.NI_DAQmx.labscript_devices import NI_DAQmx, NI_PCIe_6363
+
+# The classes whose generate_code() methods are timed:
+BENCHMARKED_CLASSES = [PulseBlaster, PineBlaster, CiceroOpalKellyXEM3001, NovaTechDDS9M, NI_DAQmx]
+
+PSEUDOCLOCKS = ['PulseBlaster', 'PineBlaster', 'CiceroOpalKellyXEM3001']
+
+# Sample rate of the ramps, alternating between this and half of it from one
+# segment to the next:
+SAMPLE_RATE = 100e3
+
+
+class GenerateCodeTimer(object):
+    """Wraps the generate_code() methods of the given classes in order to accumulate
+    the time spent in each, not counting the time spent in the generate_code() methods
+    of other wrapped classes that they call"""
+    def __init__(self, classes):
+        self.times = defaultdict(float)
+        self._child_times = []
+        self._originals = {}
+        for cls in classes:
+            self._originals[cls] = cls.__dict__['generate_code']
+            cls.generate_code = self._make_wrapper(cls, self._originals[cls])
+
+    def _make_wrapper(self, cls, original):
+        def generate_code(device, hdf5_file):
+            self._child_times.append(0)
+            start_time = perf_counter()
+            try:
+                return original(device, hdf5_file)
+            finally:
+                elapsed = perf_counter() - start_time
+                self.times[cls.__name__] += elapsed - self._child_times.pop()
+                if self._child_times:
+                    self._child_times[-1] += elapsed
+        return generate_code
+
+    def reset(self):
+        self.times.clear()
+
+    def restore(self):
+        for cls, original in self._originals.items():
+            cls.generate_code = original
+
+
+def build_shot(pseudoclock, n_ticks, segment_ticks, n_waits, use_dds):
+    """Define the devices and instructions of a synthetic shot, returning the stop
+    time"""
+    if pseudoclock == 'PulseBlaster':
+        # No hardware is programmed, so don't restrict the number of instructions:
+        master = PulseBlaster('pulseblaster', max_instructions=2**32)
+        clockline = ClockLine('ni_clockline', master.pseudoclock, 'flag 0')
+    elif pseudoclock == 'PineBlaster':
+        master = PineBlaster('pineblaster')
+        clockline = master.clockline
+    elif pseudoclock == 'CiceroOpalKellyXEM3001':
+        master = CiceroOpalKellyXEM3001('cicero', use_wait_monitor=bool(n_waits))
+        clockline = master.clockline
+    else:
+        raise ValueError(pseudoclock)
+
+    ni = NI_PCIe_6363('ni', clockline, clock_terminal='PFI0')
+    analog_outs = [AnalogOut('ao%d' % i, ni, 'ao%d' % i) for i in range(2)]
+    digital_outs = [DigitalOut('do%d' % i, ni, 'port0/line%d' % i) for i in range(2)]
+    if n_waits and pseudoclock != 'CiceroOpalKellyXEM3001':
+        # The CiceroOpalKellyXEM3001 monitors its own waits. Otherwise the NI card
+        # is the wait monitor, with a digital out added to keep the number of them
+        # even:
+        WaitMonitor('wait_monitor', ni, 'port0/line2', ni, 'Ctr0', ni, 'port1/line0')
+        DigitalOut('do_spare', ni, 'port0/line3')
+
+    dds_outs = []
+    if use_dds:
+        if pseudoclock != 'PulseBlaster':
+            raise ValueError('DDS outputs are only benchmarked with the PulseBlaster')
+        novatech_clockline = ClockLine('novatech_clockline', master.pseudoclock, 'flag 1')
+        novatech = NovaTechDDS9M('novatech', novatech_clockline)
+        dds_outs.append(DDS('pulseblaster_dds', master.direct_outputs, 'dds 0'))
+        dds_outs.append(DDS('novatech_dds', novatech, 'channel 0'))
+
+    start()
+    n_segments = max(1, n_ticks // segment_ticks)
+    wait_segments = set(n_segments * (k + 1) // (n_waits + 1) for k in range(n_waits))
+    t = 0
+    for i in range(n_segments):
+        samplerate = SAMPLE_RATE if i % 2 == 0 else SAMPLE_RATE / 2
+        duration = segment_ticks / samplerate
+        analog_outs[0].ramp(t, duration, initial=0, final=1, samplerate=samplerate)
+        analog_outs[1].ramp(t, duration, initial=1, final=0, samplerate=samplerate)
+        for output in digital_outs:
+            if i % 2 == 0:
+                output.go_high(t)
+            else:
+                output.go_low(t)
+        # Cycle through a limited set of frequencies so as not to run out of
+        # DDS registers:
+        for output in dds_outs:
+            output.setfreq(t, 10e6 + (i % 100) * 1e3)
+        t += duration
+        if i in wait_segments:
+            wait('wait_%d' % i, t)
+            t += 10 / SAMPLE_RATE
+    return t + 10 / SAMPLE_RATE
+
+
+def compile_shot(h5_path, *args):
+    labscript_init(h5_path, new=True, overwrite=True)
+    try:
+        stop(build_shot(*args))
+    finally:
+        labscript_cleanup()
+
+
+def run_case(timer, h5_path, pseudoclock, n_ticks, segment_ticks, n_waits, use_dds, repeats):
+    """Compile the shot, returning the best time of each device over the repeats, the
+    total compilation time, and the peak memory allocated, or a string describing the
+    error if the shot cannot be compiled"""
+    args = (pseudoclock, n_ticks, segment_ticks, n_waits, use_dds)
+    best = None
+    try:
+        for _ in range(repeats):
+            timer.reset()
+            start_time = perf_counter()
+            compile_shot(h5_path, *args)
+            total_time = perf_counter() - start_time
+            if best is None or total_time < best['total_time']:
+                best = {'total_time': total_time, 'device_times': dict(timer.times)}
+        # Memory is measured in a separate run since tracing allocations slows down
+        # compilation considerably:
+        if tracemalloc is not None:
+            tracemalloc.start()
+            try:
+                compile_shot(h5_path, *args)
+                best['peak_memory'] = tracemalloc.get_traced_memory()[1]
+            finally:
+                tracemalloc.stop()
+    except LabscriptError as e:
+        return str(e).strip().splitlines()[0]
+    return best
+
+
+def case_name(pseudoclock, n_ticks, n_waits, use_dds):
+    name = '%s, %d ticks' % (pseudoclock, n_ticks)
+    if n_waits:
+        name += ', %d waits' % n_waits
+    if use_dds:
+        name += ', DDS'
+    return name
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--pseudoclocks', nargs='+', choices=PSEUDOCLOCKS, default=PSEUDOCLOCKS)
+    parser.add_argument('--ticks', nargs='+', type=int, default=[1000, 10000, 100000, 1000000],
+                        help='numbers of clock ticks of the NI DAQmx device to benchmark')
+    parser.add_argument('--segment-ticks', type=int, default=100,
+                        help='clock ticks per segment of constant sample rate')
+    parser.add_argument('--waits', type=int, default=10,
+                        help='number of waits in cases with waits')
+    parser.add_argument('--repeats', type=int, default=1,
+                        help='compile each case this many times, reporting the fastest')
+    parser.add_argument('--output', help='save results to this JSON file')
+    parser.add_argument('--compare', help='compare against results saved in this JSON file')
+    args = parser.parse_args()
+
+    previous = {}
+    if args.compare is not None:
+        with open(args.compare) as f:
+            previous = json.load(f)
+
+    timer = GenerateCodeTimer(BENCHMARKED_CLASSES)
+    h5_path = os.path.join(tempfile.mkdtemp(), 'benchmark.h5')
+    results = {}
+    try:
+        for pseudoclock, n_ticks, n_waits, use_dds in itertools.product(
+            args.pseudoclocks, args.ticks, [0, args.waits], [False, True]
+        ):
+            if use_dds and pseudoclock != 'PulseBlaster':
+                continue
+            name = case_name(pseudoclock, n_ticks, n_waits, use_dds)
+            result = run_case(timer, h5_path, pseudoclock, n_ticks, args.segment_ticks,
+                              n_waits, use_dds, args.repeats)
+            results[name] = result
+            print(name)
+            if not isinstance(result, dict):
+                print('    not compiled: %s' % result)
+                continue
+            for device, device_time in sorted(result['device_times'].items()):
+                line = '    %-24s %10.4f s %14.0f ticks/s' % (device, device_time, n_ticks / device_time)
+                old = previous.get(name)
+                if isinstance(old, dict) and device in old['device_times']:
+                    line += '  (%.2fx previous time)' % (device_time / old['device_times'][device])
+                print(line)
+            print('    %-24s %10.4f s' % ('total', result['total_time']))
+            if 'peak_memory' in result:
+                print('    %-24s %10.1f MB' % ('peak memory', result['peak_memory'] / 1e6))
+            sys.stdout.flush()
+    finally:
+        timer.restore()
+        shutil.rmtree(os.path.dirname(h5_path))
+
+    if args.output is not None:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=4, sort_keys=True)
+
+
+if __name__ == '__main__':
+    main()
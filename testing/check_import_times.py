@@ -0,0 +1,135 @@
+"""Check that each labscript device module imports within a time budget.
+
+Every shot compilation imports the modules defining the labscript device classes in
+its connection table, so these should not import BLACS, Qt, or other dependencies
+only needed by BLACS tabs and workers. Each module is imported in a fresh Python
+interpreter, after numpy, h5py, labscript and labscript_devices, which every
+compilation imports anyway. The fastest of a number of repeats is compared against
+the budget, and any GUI or other heavy modules the import pulled in are listed:
+
+    python check_import_times.py --budget 50
+
+The exit status is nonzero if any module exceeds its budget, imports any of the
+heavy modules, or cannot be imported at all, since then nothing about it has been
+checked. Modules that cannot be imported on a particular machine, for example
+because a vendor library is not installed, can be excluded with --skip.
+"""
+from __future__ import division, unicode_literals, print_function, absolute_import
+from labscript_utils import PY2
+if PY2:
+    str = unicode
+
+import os
+import sys
+import argparse
+import subprocess
+
+LABSCRIPT_DEVICES_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Top-level modules of labscript_devices that do not define labscript devices:
+NOT_DEVICE_MODULES = ['__init__', 'atsapi', 'imaqdx_server']
+
+# Modules that a device module importing them is likely to not need at compile time:
+HEAVY_MODULES = ['blacs', 'qtutils', 'PyQt5', 'PyQt4', 'PySide2', 'PIL', 'tqdm']
+
+# Run in the fresh interpreter to time the import and list the heavy modules that it
+# imported:
+TIMER = """
+import sys
+import importlib
+try:
+    from time import perf_counter
+except ImportError:
+    from time import time as perf_counter
+import numpy, h5py, labscript, labscript_devices
+already_imported = set(sys.modules)
+start_time = perf_counter()
+importlib.import_module(%r)
+elapsed = perf_counter() - start_time
+heavy = [name for name in %r if name in sys.modules and name not in already_imported]
+print(elapsed, ','.join(heavy) or '-')
+"""
+
+
+def find_device_modules():
+    """Return the names of the top-level modules of labscript_devices, and the
+    labscript_devices.py modules of its subpackages"""
+    modules = []
+    for filename in sorted(os.listdir(LABSCRIPT_DEVICES_DIR)):
+        path = os.path.join(LABSCRIPT_DEVICES_DIR, filename)
+        name, ext = os.path.splitext(filename)
+        if ext == '.py' and name not in NOT_DEVICE_MODULES:
+            modules.append('labscript_devices.' + name)
+        elif os.path.exists(os.path.join(path, 'labscript_devices.py')):
+            modules.append('labscript_devices.%s.labscript_devices' % filename)
+    return modules
+
+
+def time_import(module_name):
+    """Import the module in a fresh interpreter, returning the time taken and a list
+    of the heavy modules imported. Raises ImportError with the last line of the
+    interpreter's output if the module could not be imported"""
+    code = TIMER % (module_name, HEAVY_MODULES)
+    try:
+        output = subprocess.check_output(
+            [sys.executable, '-c', code], stderr=subprocess.STDOUT
+        )
+    except subprocess.CalledProcessError as e:
+        lines = e.output.decode('utf8', 'replace').strip().splitlines()
+        raise ImportError(lines[-1] if lines else 'exit status %d' % e.returncode)
+    elapsed, heavy = output.decode('utf8').split()[-2:]
+    return float(elapsed), [name for name in heavy.split(',') if name != '-']
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('modules', nargs='*',
+                        help='modules to check, default: all device modules')
+    parser.add_argument('--budget', type=float, default=100,
+                        help='maximum import time of each module in milliseconds')
+    parser.add_argument('--module-budget', nargs=2, action='append', default=[],
+                        metavar=('MODULE', 'BUDGET'),
+                        help='a different budget in milliseconds for one module')
+    parser.add_argument('--repeats', type=int, default=3,
+                        help='import each module this many times, checking the fastest')
+    parser.add_argument('--skip', action='append', default=[], metavar='MODULE',
+                        help='a module not to check, for example one needing a vendor '
+                             'library not installed on this machine')
+    args = parser.parse_args()
+
+    budgets = {name: float(budget) for name, budget in args.module_budget}
+    failures = {'over budget': [], 'imported heavy modules': [], 'failed to import': []}
+    for module_name in args.modules or find_device_modules():
+        if module_name in args.skip:
+            print('%-56s skipped' % module_name)
+            continue
+        budget = budgets.get(module_name, args.budget)
+        try:
+            results = [time_import(module_name) for _ in range(args.repeats)]
+        except ImportError as e:
+            print('%-56s FAILED TO IMPORT: %s' % (module_name, e))
+            failures['failed to import'].append(module_name)
+            continue
+        elapsed = min(elapsed for elapsed, _ in results) * 1e3
+        heavy = results[0][1]
+        line = '%-56s %8.1f ms' % (module_name, elapsed)
+        if heavy:
+            line += '  IMPORTS %s' % ', '.join(heavy)
+            failures['imported heavy modules'].append(module_name)
+        if elapsed > budget:
+            line += '  OVER BUDGET (%.0f ms)' % budget
+            failures['over budget'].append(module_name)
+        print(line)
+        sys.stdout.flush()
+
+    failed = False
+    for reason, module_names in failures.items():
+        if module_names:
+            print('%d module(s) %s' % (len(module_names), reason))
+            failed = True
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()